@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+import time
+from collections import Counter
+
+import discord
+
+
+class FakeResponse:
+    """Just enough of aiohttp's response for discord.HTTPException."""
+    status = 404
+    reason = "Not Found"
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id, content=None, embed=None):
+        self.channel = channel
+        self.id = message_id
+        self.content = content
+        self.embed = embed
+
+    async def edit(self, embed=None, view=None, **kwargs):
+        async with self.channel.call("edit"):
+            if self.id not in self.channel.messages:
+                raise discord.NotFound(FakeResponse(), "Unknown Message")
+            self.embed = embed
+        return self
+
+    async def delete(self):
+        async with self.channel.call("delete"):
+            self.channel.messages.pop(self.id, None)
+
+
+class FakeChannel:
+    """
+    Stands in for the scrims TextChannel. Every REST call is counted, timed
+    and delayed by `latency` seconds, the way a real round trip would be.
+    """
+
+    def __init__(self, channel_id: int, latency: float = 0.0):
+        self.id = channel_id
+        self.latency = latency
+        self.messages = {}
+        self.calls = Counter()
+        self.timings = []
+        self._ids = itertools.count(10_000)
+
+    def call(self, kind: str):
+        return _TimedCall(self, kind)
+
+    def reset(self):
+        self.calls.clear()
+        self.timings.clear()
+
+    async def send(self, content=None, embed=None, **kwargs):
+        async with self.call("send"):
+            msg = FakeMessage(self, next(self._ids), content, embed)
+            self.messages[msg.id] = msg
+        return msg
+
+    async def fetch_message(self, message_id: int):
+        async with self.call("fetch"):
+            if message_id not in self.messages:
+                raise discord.NotFound(FakeResponse(), "Unknown Message")
+            return self.messages[message_id]
+
+    def get_partial_message(self, message_id: int):
+        # No request: discord builds partial messages locally
+        return self.messages.get(message_id) or FakeMessage(self, message_id)
+
+    async def delete_messages(self, messages):
+        async with self.call("bulk_delete"):
+            for msg in messages:
+                self.messages.pop(msg.id, None)
+
+
+class FakeInteraction:
+    """A button click on a board message; its reply is counted on `channel`."""
+
+    def __init__(self, channel: FakeChannel, custom_id: str, user_id: int):
+        self.type = discord.InteractionType.component
+        self.data = {"custom_id": custom_id}
+        self.user = FakeUser(user_id)
+        self.response = FakeInteractionResponse(channel)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeInteractionResponse:
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def send_message(self, content=None, **kwargs):
+        async with self.channel.call("interaction_reply"):
+            pass
+
+
+class _TimedCall:
+    def __init__(self, channel, kind):
+        self.channel = channel
+        self.kind = kind
+
+    async def __aenter__(self):
+        self.started = time.perf_counter()
+        self.channel.calls[self.kind] += 1
+        if self.channel.latency:
+            await asyncio.sleep(self.channel.latency)
+
+    async def __aexit__(self, *exc):
+        self.channel.timings.append((self.kind, time.perf_counter() - self.started))
+
+
+def install(scrimbot, channel: FakeChannel):
+    """Point the bot at `channel` and mark it ready without logging in."""
+    bot = scrimbot.bot
+    bot.get_channel = lambda channel_id: channel
+    bot.is_ready = lambda: True
@@ -0,0 +1,385 @@
+"""
+Benchmarks the webapp and bot in one process against a throwaway SQLite
+file and a fake Discord channel. No token or network needed.
+
+    python bench/run.py                                 # every scenario
+    python bench/run.py pages storm --scrims 5000
+    python bench/run.py --json before.json
+    python bench/run.py --baseline before.json          # exit 1 on regressions
+
+Reports p50/p99 latency per operation, SQL statements run and Discord
+REST calls made by each scenario.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CWD = Path.cwd()
+os.environ["DB_PATH"] = str(Path(tempfile.mkdtemp(prefix="scrimbench-")) / "bench.db")
+os.environ.setdefault("TEST_GUILD_ID", "1")
+os.environ.setdefault("SCRIMS_CHANNEL_ID", "2")
+os.environ["SCRIMBOT_MODE"] = "external"
+sys.path[:0] = [str(ROOT), str(ROOT / "webapp")]
+os.chdir(ROOT / "webapp")
+
+import httpx
+import pytz
+
+import db
+import main
+import metrics
+import scrimbot
+from outbound import PRIORITY_REMINDER
+from fake_discord import FakeChannel, FakeInteraction, install
+from seed import seed_players, seed_scrims, seed_availability, TEAM_NAMES
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+# --- Measurement ---
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+class Recorder:
+    """Latency samples per operation plus SQL and Discord call counters."""
+
+    def __init__(self, channel: FakeChannel):
+        self.channel = channel
+        self.statements = 0
+        self.samples = defaultdict(list)
+
+    def trace(self, sql):
+        self.statements += 1
+
+    async def time(self, name, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.samples[name].append(time.perf_counter() - started)
+
+    def begin(self):
+        self.samples = defaultdict(list)
+        self.channel.reset()
+        self._statements_before = self.statements
+
+    def report(self):
+        return {
+            "latency_ms": {
+                name: {
+                    "count": len(values),
+                    "p50": round(percentile(values, 50) * 1000, 2),
+                    "p99": round(percentile(values, 99) * 1000, 2),
+                    "max": round(max(values) * 1000, 2),
+                }
+                for name, values in self.samples.items()
+            },
+            "db_statements": self.statements - self._statements_before,
+            "discord_calls": dict(self.channel.calls),
+        }
+
+
+async def request(client, rec, method, url, name=None, **kwargs):
+    response = await rec.time(name or url, client.request(method, url, **kwargs))
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method} {url} -> {response.status_code}: {response.text[:200]}")
+    return response
+
+async def drain_bot():
+    """Wait until the change feed, board refresh and outbound queue are idle."""
+    quiet = 0
+    while quiet < 2:
+        await asyncio.sleep(0.05)
+        busy = (
+            await db.fetch_scrim_events(limit=1)
+            or any(
+                board["dirty"] or (board["task"] is not None and not board["task"].done())
+                for board in scrimbot.boards.values()
+            )
+            or scrimbot.outbound.backlog
+        )
+        quiet = 0 if busy else quiet + 1
+
+
+# --- Scenarios ---
+async def scenario_pages(client, rec, args, rng):
+    """Every page and read endpoint a browser hits, warm cache after the first pass."""
+    today = date.today()
+    month_end = today + timedelta(days=30)
+    paths = [
+        "/",
+        "/scrims?page=1",
+        "/availability",
+        "/stats",
+        "/api/players",
+        "/api/availability?player_id=1&week_offset=0",
+        "/api/availability/matrix?week_offset=0",
+        f"/api/availability/matrix?start={today}&end={month_end}",
+        f"/api/availability/windows?start={today}&end={month_end}&duration=120&min_players={max(1, args.players - 1)}",
+    ]
+    for _ in range(args.iterations):
+        for path in paths:
+            await request(client, rec, "GET", path)
+
+async def scenario_storm(client, rec, args, rng):
+    """Many players clicking availability cells at once, single and batched."""
+    limit = asyncio.Semaphore(args.concurrency)
+
+    def change():
+        return {
+            "player_id": rng.randint(1, args.players),
+            "day": rng.choice(DAYS),
+            "time": rng.choice(db.AVAILABILITY_SLOTS),
+            "status": rng.choice(db.AVAILABILITY_STATUSES),
+            "week_offset": rng.randint(0, 3),
+        }
+
+    async def click():
+        async with limit:
+            await request(client, rec, "POST", "/api/availability", json=change())
+
+    async def batch():
+        async with limit:
+            await request(client, rec, "POST", "/api/availability/batch",
+                          json={"changes": [change() for _ in range(20)]})
+
+    await asyncio.gather(*(click() for _ in range(args.iterations * 20)))
+    await asyncio.gather(*(batch() for _ in range(args.iterations * 2)))
+
+async def scenario_scrims(client, rec, args, rng):
+    """
+    Bursts of adds, edits and deletes (double-booking allowed, the times are
+    random), a checked bulk import of fixtures, then the bot catching up on
+    Discord.
+    """
+    limit = asyncio.Semaphore(args.concurrency)
+    tomorrow = date.today() + timedelta(days=1)
+
+    def scrim(i):
+        day = tomorrow + timedelta(days=rng.randrange(14))
+        hour = rng.choice([18, 19, 20, 21])
+        return {"name": f"Burst {i}", "date": day.isoformat(),
+                "start_time": f"{hour}:00", "end_time": f"{hour + 1}:30", "note": "bench", "allow_overlap": True}
+
+    async def post(url, payload):
+        async with limit:
+            await request(client, rec, "POST", url, json=payload)
+
+    count = args.iterations * 5
+    await asyncio.gather(*(post("/add", scrim(i)) for i in range(count)))
+    async with db.read_db() as conn:
+        cursor = await conn.execute("SELECT id FROM scrims WHERE name LIKE 'Burst %' ORDER BY id")
+        ids = [row[0] for row in await cursor.fetchall()]
+    await asyncio.gather(*(post("/edit", dict(scrim(i), scrim_id=sid)) for i, sid in enumerate(ids)))
+    await asyncio.gather(*(post("/delete", {"scrim_id": sid}) for sid in ids[: len(ids) // 2]))
+
+    # Fixtures after the seeded schedule, one a day, checked against the index
+    first_day = tomorrow + timedelta(days=args.days + 30)
+    fixtures = [
+        {"name": f"Fixture {i}", "date": (first_day + timedelta(days=i)).isoformat(),
+         "start_time": "12:00", "end_time": "13:00"}
+        for i in range(args.iterations)
+    ]
+    await request(client, rec, "POST", "/api/scrims/import", json=fixtures)
+    await rec.time("bot catch-up", drain_bot())
+
+async def scenario_reminders(client, rec, args, rng):
+    """A simulated day of deadlines: rebuild the schedule, then fire each one in order."""
+    scheduler = scrimbot.reminder_scheduler
+    scrimbot.BOARD_DEBOUNCE_SECONDS = 0
+    await rec.time("load_schedule", scrimbot.load_schedule())
+
+    horizon = datetime.now(pytz.utc) + timedelta(days=1)
+    day = [entry for entry in scheduler.pending() if entry[0] <= horizon]
+    for fire_at, scrim_id, kind in day:
+        name = kind if kind in ("start", "end") else "reminder"
+        await rec.time(f"deadline: {name}", scrimbot.handle_deadline(scrim_id, kind, fire_at))
+        await drain_bot()
+
+async def scenario_autocomplete(client, rec, args, rng):
+    """Slash command autocomplete keystrokes answered from the in-memory indexes."""
+    await rec.time("load_indexes", scrimbot.load_indexes())
+    options = {
+        "scrim": (scrimbot.autocomplete(lambda ctx: scrimbot.scrim_indexes.get(scrimbot.ctx_team(ctx)), "scrim"),
+                  TEAM_NAMES + ["captain"]),
+        "player": (scrimbot.autocomplete(lambda ctx: scrimbot.player_indexes.get(scrimbot.ctx_team(ctx)), "player"),
+                   ["Player"]),
+        "timezone": (scrimbot.autocomplete(lambda ctx: scrimbot.zone_index, "timezone"), ["Australia", "Europe", "New"]),
+    }
+    guild = SimpleNamespace(guild_id=int(os.environ["TEST_GUILD_ID"]))
+    for option, (complete, words) in options.items():
+        for _ in range(args.iterations * 10):
+            word = rng.choice(words)
+            typed = word[: rng.randint(0, len(word))]
+            ctx = SimpleNamespace(value=typed, interaction=guild)
+            choices = await rec.time(f"autocomplete: {option}", complete(ctx))
+            assert len(choices) <= 25
+
+async def scenario_rsvp(client, rec, args, rng):
+    """A burst of RSVP clicks right after a reminder, then the write-behind flush."""
+    scrimbot.RSVP_FLUSH_SECONDS = 0.5
+    rows = await db.get_upcoming_scrims(datetime.now(pytz.utc).isoformat(), limit=3)
+    clicks = [
+        FakeInteraction(
+            rec.channel,
+            f"rsvp:{rng.choice(rows)[0]}:{rng.choice(['yes', 'no'])}",
+            rng.randint(1, 200),
+        )
+        for _ in range(args.iterations * 25)
+    ]
+    await asyncio.gather(*(rec.time("click ack", scrimbot.on_rsvp_click(click)) for click in clicks))
+    await rec.time("flush + board", drain_rsvps())
+
+async def scenario_teams(client, rec, args, rng):
+    """One team floods the reminder queue; the other teams' reminders should not wait behind it."""
+    team_ids = [
+        await db.save_team(f"Bench {i}", 100_000 + i, rec.channel.id) for i in range(max(2, args.teams))
+    ]
+    await scrimbot.load_teams(force=True)
+    busy, others = team_ids[0], team_ids[1:]
+
+    def send():
+        return rec.channel.send("@everyone bench reminder")
+
+    flood = [
+        scrimbot.outbound.enqueue(PRIORITY_REMINDER, send, team=busy)
+        for _ in range(args.iterations * 10)
+    ]
+    await asyncio.gather(*(
+        rec.time("reminder behind another team's flood", scrimbot.outbound.submit(PRIORITY_REMINDER, send, team=team_id))
+        for team_id in others
+    ))
+    await rec.time("flood drained", asyncio.gather(*flood))
+
+async def drain_rsvps():
+    while scrimbot.pending_rsvps or not scrimbot._rsvp_flush_task.done():
+        await asyncio.sleep(0.05)
+    await drain_bot()
+
+SCENARIOS = {
+    "pages": scenario_pages,
+    "storm": scenario_storm,
+    "scrims": scenario_scrims,
+    "reminders": scenario_reminders,
+    "autocomplete": scenario_autocomplete,
+    "rsvp": scenario_rsvp,
+    "teams": scenario_teams,
+}
+
+
+# --- Runner ---
+async def run(args):
+    rng = random.Random(args.seed)
+    await db.open_db()
+    await db.init_db()
+    await seed_players(args.players)
+    await seed_scrims(args.scrims, args.days, rng)
+    await seed_availability(args.players, args.availability_days, rng)
+
+    channel = FakeChannel(int(os.environ["SCRIMS_CHANNEL_ID"]), latency=args.discord_latency / 1000)
+    rec = Recorder(channel)
+    await db.trace_db(rec.trace)
+
+    install(scrimbot, channel)
+    main.bot_module = scrimbot
+    scrimbot.outbound.start()
+    await scrimbot.load_teams(force=True)
+    await scrimbot.load_board_messages(channel)
+    await scrimbot.update_scrims_board()
+    await scrimbot.load_indexes()
+    feed = asyncio.create_task(scrimbot.consume_change_feed())
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in args.scenarios:
+                rec.begin()
+                started = time.perf_counter()
+                await SCENARIOS[name](client, rec, args, rng)
+                results[name] = dict(rec.report(), wall_s=round(time.perf_counter() - started, 3))
+                print_report(name, results[name])
+    finally:
+        feed.cancel()
+        await scrimbot.outbound.stop()
+        await db.trace_db(None)
+        await db.close_db()
+    return results
+
+def print_report(name, result):
+    print(f"\n== {name} ({result['wall_s']}s, {result['db_statements']} SQL statements) ==")
+    print(f"  {'operation':58} {'n':>6} {'p50 ms':>9} {'p99 ms':>9}")
+    for op, stats in result["latency_ms"].items():
+        print(f"  {op[:58]:58} {stats['count']:>6} {stats['p50']:>9} {stats['p99']:>9}")
+    calls = ", ".join(f"{kind}={n}" for kind, n in sorted(result["discord_calls"].items())) or "none"
+    print(f"  discord calls: {calls}")
+
+def regressions(results, baseline, tolerance):
+    """Operations whose p99, statement count or Discord calls grew past tolerance."""
+    found = []
+
+    def check(label, now, before, slack=0):
+        if before is not None and now > before * (1 + tolerance) + slack:
+            found.append(f"{label}: {before} -> {now}")
+
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        check(f"{name} SQL statements", result["db_statements"], old["db_statements"])
+        for kind, n in result["discord_calls"].items():
+            check(f"{name} discord {kind}", n, old["discord_calls"].get(kind, 0))
+        for op, stats in result["latency_ms"].items():
+            if op in old["latency_ms"]:
+                # 1ms of slack so tiny timings do not flap
+                check(f"{name} {op} p99 ms", stats["p99"], old["latency_ms"][op]["p99"], slack=1)
+    return found
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--scrims", type=int, default=2000, help="scrims seeded before the run")
+    parser.add_argument("--days", type=int, default=90, help="days the seeded scrims are spread over")
+    parser.add_argument("--players", type=int, default=6, help="roster size")
+    parser.add_argument("--teams", type=int, default=20, help="teams sharing the bot in the teams scenario")
+    parser.add_argument("--availability-days", type=int, default=120, help="days of seeded availability")
+    parser.add_argument("--iterations", type=int, default=20, help="repeats per scenario step")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--discord-latency", type=float, default=50, help="fake REST round trip in ms")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against an earlier --json file")
+    parser.add_argument("--metrics", help="write the /metrics exposition at the end of the run to this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed growth over the baseline")
+    args = parser.parse_args()
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    results = asyncio.run(run(args))
+
+    if args.metrics:
+        (CWD / args.metrics).write_text(metrics.render())
+    if args.json:
+        (CWD / args.json).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        found = regressions(results, json.loads((CWD / args.baseline).read_text()), args.tolerance)
+        print("\nRegressions:" if found else "\nNo regressions against baseline")
+        for line in found:
+            print(f"  {line}")
+        sys.exit(1 if found else 0)
+
+if __name__ == "__main__":
+    main_cli()
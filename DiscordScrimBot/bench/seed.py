@@ -0,0 +1,67 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytz
+
+from db import write_db, bump_version, AVAILABILITY_SLOTS, SLOT_MINUTES, DEFAULT_TEAM_ID
+
+TEAM_NAMES = [
+    "Ascend", "Blacklist", "Chaos", "Drift", "Eclipse", "Fury", "Ghost", "Havoc",
+    "Ion", "Jolt", "Karma", "Lotus", "Mirage", "Nova", "Onyx", "Pulse",
+]
+
+
+async def seed_players(count: int):
+    """Make sure players 1..count exist."""
+    async with write_db() as db:
+        await db.executemany(
+            "INSERT OR IGNORE INTO players (id, name) VALUES (?, ?)",
+            [(i, f"Player {i}") for i in range(1, count + 1)]
+        )
+        await bump_version(db, "players", DEFAULT_TEAM_ID)
+
+
+async def seed_scrims(count: int, days: int, rng: random.Random, start: datetime = None):
+    """`count` evening scrims spread over the next `days` days."""
+    start = start or datetime.now(pytz.utc)
+    rows = []
+    for i in range(count):
+        begins = (start + timedelta(days=rng.randrange(days)))
+        begins = begins.replace(hour=rng.choice([8, 9, 10, 11, 12]), minute=rng.choice([0, 30]), second=0, microsecond=0)
+        if begins <= start:
+            begins += timedelta(days=1)
+        ends = begins + timedelta(minutes=rng.choice([60, 90, 120]))
+        rows.append((
+            f"{rng.choice(TEAM_NAMES)} #{i}",
+            begins.isoformat(),
+            ends.isoformat(),
+            rng.choice([None, "captain#0001"]),
+            rng.choice([None, "", "Bo3 on Haven", "bring subs"]),
+        ))
+
+    async with write_db() as db:
+        await db.executemany("""
+            INSERT INTO scrims (name, start_time_utc, end_time_utc, contact, note)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        await bump_version(db, "scrims", DEFAULT_TEAM_ID)
+    return len(rows)
+
+
+async def seed_availability(players: int, days: int, rng: random.Random, first: date = None, fill: float = 0.7):
+    """Fill roughly `fill` of every player's evening slots for `days` days."""
+    first = first or date.today() - timedelta(days=days // 4)
+    rows = []
+    for player_id in range(1, players + 1):
+        for d in range(days):
+            day = (first + timedelta(days=d)).isoformat()
+            for slot in AVAILABILITY_SLOTS:
+                if rng.random() < fill:
+                    rows.append((player_id, day, SLOT_MINUTES[slot], rng.choice([1, 1, 2])))
+
+    async with write_db() as db:
+        await db.executemany("""
+            INSERT OR REPLACE INTO availability_slots (player_id, day, minute, status)
+            VALUES (?, ?, ?, ?)
+        """, rows)
+    return len(rows)
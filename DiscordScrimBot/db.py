@@ -1,169 +1,1620 @@
 import aiosqlite
 import asyncio
+import functools
+import heapq
+import itertools
 import os
-from typing import Dict
-from datetime import datetime
-from pathlib import Path
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List
+from datetime import datetime, date, timedelta, timezone
+
+from metrics import Histogram
+from intervals import IntervalIndex, to_seconds
+from recurrence import (
+    SERIES_COLUMNS, series_occurrences, occurs_at, is_occurrence, split_occurrence_id, parse_rule, last_end,
+)
+from tz import DEFAULT_TIMEZONE, get_zone
 
 DB = os.getenv("DB_PATH", "scrims.db")
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256
 
-async def init_db():
-    """Initialize all tables in the database."""
-    async with aiosqlite.connect(DB) as db:
-        # --- Scrims table ---
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS scrims (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            start_time_utc TEXT NOT NULL,
-            end_time_utc TEXT NOT NULL,
-            contact TEXT,
-            note TEXT
+# Evening grid shown on the availability page. Minutes are offsets from
+# midnight of the grid day, so the closing "12AM" slot is 1440.
+AVAILABILITY_SLOTS = ["6PM", "7PM", "8PM", "9PM", "10PM", "11PM", "12AM"]
+SLOT_MINUTES = {"6PM": 1080, "7PM": 1140, "8PM": 1200, "9PM": 1260, "10PM": 1320, "11PM": 1380, "12AM": 1440}
+AVAILABILITY_STATUSES = ["none", "available", "unavailable"]
+DAY_LABEL_FORMAT = "%A %d/%m/%Y"
+# Ended scrims moved to scrim_history per transaction
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Series are expanded this far ahead when a read gives no end (board, bot)
+SERIES_HORIZON_DAYS = int(os.getenv("SERIES_HORIZON_DAYS", "28"))
+_SLOT_LABEL = re.compile(r"^(\d{1,2})(?::(\d{2}))?\s*(AM|PM)?$", re.IGNORECASE)
+
+# Team of a pre-teams install; unscoped routes and old rows belong to it
+DEFAULT_TEAM_ID = 1
+# config rows that belong to the whole process rather than a team
+GLOBAL_CONFIG_TEAM = 0
+
+# Applied to every pooled connection when it is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+# --- Instrumentation ---
+QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time spent in each db.py helper, including pool waits.", ("query",)
+)
+POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection.", ("mode",)
+)
+POOL_HOLD_SECONDS = Histogram(
+    "db_pool_hold_seconds", "Time a pooled connection was held.", ("mode",)
+)
+
+def timed_query(func):
+    """Record each call of a db helper in QUERY_SECONDS, labelled by its name."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with QUERY_SECONDS.time(query=func.__name__):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+# --- Connection pool ---
+class ConnectionPool:
+    """
+    Long-lived connections shared by the bot and the webapp.
+
+    One writer connection (serialised by a lock, committed on exit) and a
+    handful of query-only readers. With WAL journaling readers never wait
+    behind the writer.
+    """
+
+    def __init__(self, path: str, readers: int = DB_READERS):
+        self.path = path
+        self.reader_count = max(1, readers)
+        self._writer = None
+        self._watcher = None
+        self._write_lock = asyncio.Lock()
+        self._readers = asyncio.Queue()
+        self._all = []
+
+    async def _connect(self, query_only: bool = False):
+        conn = await aiosqlite.connect(self.path, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        if query_only:
+            await conn.execute("PRAGMA query_only=ON")
+        self._all.append(conn)
+        return conn
+
+    async def open(self):
+        # Writer first so WAL mode is switched on before readers attach
+        self._writer = await self._connect()
+        self._watcher = await self._connect(query_only=True)
+        for _ in range(self.reader_count):
+            self._readers.put_nowait(await self._connect(query_only=True))
+
+    async def close(self):
+        for conn in self._all:
+            try:
+                await conn.close()
+            except Exception as e:
+                print(f"Failed to close DB connection: {e}")
+        self._all.clear()
+        self._writer = None
+        self._watcher = None
+        self._readers = asyncio.Queue()
+
+    async def set_trace_callback(self, callback):
+        """Call `callback(sql)` for every statement run on any pooled connection."""
+        for conn in self._all:
+            await conn.set_trace_callback(callback)
+
+    async def data_version(self) -> int:
+        """Changes whenever another connection (or process) commits."""
+        cursor = await self._watcher.execute("PRAGMA data_version")
+        return (await cursor.fetchone())[0]
+
+    @asynccontextmanager
+    async def read(self):
+        requested = time.perf_counter()
+        conn = await self._readers.get()
+        acquired = time.perf_counter()
+        POOL_WAIT_SECONDS.observe(acquired - requested, mode="read")
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+            POOL_HOLD_SECONDS.observe(time.perf_counter() - acquired, mode="read")
+
+    @asynccontextmanager
+    async def write(self):
+        requested = time.perf_counter()
+        async with self._write_lock:
+            acquired = time.perf_counter()
+            POOL_WAIT_SECONDS.observe(acquired - requested, mode="write")
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            else:
+                await self._writer.commit()
+            finally:
+                POOL_HOLD_SECONDS.observe(time.perf_counter() - acquired, mode="write")
+
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+async def open_db():
+    """Open the shared pool. Safe to call more than once."""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            pool = ConnectionPool(DB)
+            await pool.open()
+            _pool = pool
+    return _pool
+
+async def close_db():
+    """Close every pooled connection (called on shutdown)."""
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+async def trace_db(callback):
+    """Install (or with None, remove) a statement trace on the open pool."""
+    pool = _pool or await open_db()
+    await pool.set_trace_callback(callback)
+
+async def get_data_version() -> int:
+    pool = _pool or await open_db()
+    return await pool.data_version()
+
+@asynccontextmanager
+async def read_db():
+    """Borrow a reader connection from the pool."""
+    pool = _pool or await open_db()
+    async with pool.read() as conn:
+        yield conn
+
+@asynccontextmanager
+async def write_db():
+    """Hold the writer connection; commits on success, rolls back on error."""
+    pool = _pool or await open_db()
+    async with pool.write() as conn:
+        yield conn
+
+# --- Schema migrations ---
+async def _migrate_baseline(db):
+    """
+    Version 1: every table and index as of the first versioned release.
+    Databases from before versioning can be in any earlier shape, so this
+    step is idempotent: CREATE IF NOT EXISTS, columns added only where
+    missing, and the legacy config/availability tables converted in place.
+    """
+    # --- Teams (one per guild; every other table is scoped by team_id) ---
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS teams (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        guild_id INTEGER UNIQUE,
+        channel_id INTEGER            -- where the board and reminders go
+    )
+    """)
+    cursor = await db.execute("SELECT COUNT(*) FROM teams")
+    if (await cursor.fetchone())[0] == 0:
+        # The single team of a pre-teams install, configured from the env
+        await db.execute(
+            "INSERT INTO teams (id, name, guild_id, channel_id) VALUES (?, ?, ?, ?)",
+            (DEFAULT_TEAM_ID, os.getenv("TEAM_NAME", "Team"),
+             _env_int("TEST_GUILD_ID"), _env_int("SCRIMS_CHANNEL_ID"))
         )
+
+    # Tables from before teams get team_id added; their rows belong to
+    # the first team
+    TEAM_COLUMN = f"team_id INTEGER NOT NULL DEFAULT {DEFAULT_TEAM_ID}"
+
+    # --- Scrims table ---
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS scrims (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        start_time_utc TEXT NOT NULL,
+        end_time_utc TEXT NOT NULL,
+        contact TEXT,
+        note TEXT,
+        {TEAM_COLUMN}
+    )
+    """)
+    await _add_column(db, "scrims", TEAM_COLUMN)
+    # Team pages and boards seek (team_id, start); the archiver and the
+    # bot's all-team schedule use the plain time indexes
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_scrims_team_start ON scrims(team_id, start_time_utc, end_time_utc)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_scrims_start ON scrims(start_time_utc)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_scrims_end ON scrims(end_time_utc)")
+
+    # --- Recurring scrim series (occurrences are expanded on read) ---
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS scrim_series (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        dtstart TEXT NOT NULL,        -- first start, wall-clock time in `timezone`
+        duration_minutes INTEGER NOT NULL,
+        timezone TEXT NOT NULL,
+        rule TEXT NOT NULL,           -- RRULE, e.g. FREQ=WEEKLY;BYDAY=TU
+        contact TEXT,
+        note TEXT,
+        first_start_utc TEXT NOT NULL,
+        last_end_utc TEXT,            -- NULL while the rule has no end
+        {TEAM_COLUMN}
+    )
+    """)
+    await _add_column(db, "scrim_series", TEAM_COLUMN)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_scrim_series_team ON scrim_series(team_id, first_start_utc)")
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS scrim_series_exceptions (
+        series_id INTEGER NOT NULL,
+        occurrence_start TEXT NOT NULL,  -- original UTC start of the occurrence
+        name TEXT,                       -- replacement row; NULL start means skipped
+        start_time_utc TEXT,
+        end_time_utc TEXT,
+        contact TEXT,
+        note TEXT,
+        PRIMARY KEY (series_id, occurrence_start)
+    ) WITHOUT ROWID
+    """)
+
+    # --- History (ended scrims, compact) and its running summaries ---
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS scrim_history (
+        id INTEGER PRIMARY KEY,       -- the scrim's id (negative for series occurrences)
+        name TEXT NOT NULL,
+        opponent TEXT NOT NULL,       -- normalised name, key of scrim_stats_opponents
+        start_time_utc TEXT NOT NULL,
+        minutes INTEGER NOT NULL,
+        attending INTEGER NOT NULL,   -- RSVPs when it was archived
+        responses INTEGER NOT NULL,
+        {TEAM_COLUMN}
+    )
+    """)
+    await _add_column(db, "scrim_history", TEAM_COLUMN)
+    await db.execute("DROP INDEX IF EXISTS idx_scrim_history_start")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_scrim_history_team_start ON scrim_history(team_id, start_time_utc)")
+    await _create_stats_tables(db)
+
+    # --- Data versions (bumped in the same transaction as a write) ---
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        updated_at TEXT               -- UTC ISO time of the last bump
+    )
+    """)
+    await _add_column(db, "data_versions", "updated_at TEXT")
+
+    # --- Users table ---
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        timezone TEXT
+    )
+    """)
+
+    # --- Attendance table (RSVPs from the board buttons) ---
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS attendance (
+        scrim_id INTEGER,
+        user_id INTEGER,
+        status INTEGER NOT NULL DEFAULT 1,  -- 1 attending, 0 not attending
+        PRIMARY KEY (scrim_id, user_id)
+    )
+    """)
+    await _add_column(db, "attendance", "status INTEGER NOT NULL DEFAULT 1")
+    # Per-user calendar feeds look up one user's RSVPs
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_attendance_user ON attendance(user_id, status, scrim_id)")
+
+    # --- Scrim change feed (outbox read by the bot process) ---
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS scrim_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,           -- added / edited / deleted, or series
+        scrim_id INTEGER NOT NULL,    -- a series id for series events
+        created_at TEXT NOT NULL,
+        {TEAM_COLUMN}
+    )
+    """)
+    await _add_column(db, "scrim_events", TEAM_COLUMN)
+
+    # --- Reminder ledger (messages the bot has posted per scrim) ---
+    # The (scrim_id, minutes) primary key doubles as the scrim_id index.
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS reminders (
+        scrim_id INTEGER NOT NULL,
+        minutes INTEGER NOT NULL,     -- 30 / 15 / 5
+        channel_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        sent_at TEXT NOT NULL,
+        PRIMARY KEY (scrim_id, minutes)
+    ) WITHOUT ROWID
+    """)
+
+    # --- Config table (per team; team 0 holds process-wide keys) ---
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS config (
+        team_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT,
+        PRIMARY KEY (team_id, key)
+    ) WITHOUT ROWID
+    """)
+    await _migrate_legacy_config(db)
+
+    # --- Players table ---
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS players (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        {TEAM_COLUMN}
+    )
+    """)
+    await _add_column(db, "players", TEAM_COLUMN)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_players_team ON players(team_id, id)")
+
+    # --- Availability table ---
+    # One row per player per slot: ISO date plus minute-of-day, so week
+    # and month queries are a single range seek on (team_id, day, ...).
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS availability_slots (
+        player_id INTEGER NOT NULL,
+        day TEXT NOT NULL,            -- YYYY-MM-DD
+        minute INTEGER NOT NULL,      -- minutes from midnight of day
+        status INTEGER NOT NULL,      -- index into AVAILABILITY_STATUSES
+        {TEAM_COLUMN},          -- the player's team, for the range seek
+        PRIMARY KEY (player_id, day, minute),
+        FOREIGN KEY (player_id) REFERENCES players(id)
+    ) WITHOUT ROWID
+    """)
+    await _add_column(db, "availability_slots", TEAM_COLUMN)
+    await db.execute("DROP INDEX IF EXISTS idx_availability_slots_day")
+    await db.execute("""
+    CREATE INDEX IF NOT EXISTS idx_availability_slots_team_day
+    ON availability_slots(team_id, day, player_id, minute, status)
+    """)
+
+    await _migrate_legacy_availability(db)
+
+
+def _env_int(name: str):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+async def _add_column(db, table: str, column: str):
+    """ALTER TABLE ADD COLUMN for databases created before `column` existed."""
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    if column.split()[0] not in {row[1] for row in await cursor.fetchall()}:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+
+async def _create_stats_tables(db):
+    # Summaries from before teams are rebuilt from scrim_history with the
+    # team in their keys
+    cursor = await db.execute("PRAGMA table_info(scrim_stats_opponents)")
+    columns = {row[1] for row in await cursor.fetchall()}
+    rebuild = bool(columns) and "team_id" not in columns
+    if rebuild:
+        await db.execute("DROP TABLE scrim_stats_opponents")
+        await db.execute("DROP TABLE IF EXISTS scrim_stats_weeks")
+
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS scrim_stats_opponents (
+        team_id INTEGER NOT NULL,
+        opponent TEXT NOT NULL,
+        name TEXT NOT NULL,           -- as last played
+        scrims INTEGER NOT NULL,
+        minutes INTEGER NOT NULL,
+        attending INTEGER NOT NULL,
+        responses INTEGER NOT NULL,
+        last_played TEXT NOT NULL,
+        PRIMARY KEY (team_id, opponent)
+    ) WITHOUT ROWID
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS scrim_stats_weeks (
+        team_id INTEGER NOT NULL,
+        week TEXT NOT NULL,           -- Monday of the week in TEAM_TIMEZONE
+        scrims INTEGER NOT NULL,
+        minutes INTEGER NOT NULL,
+        attending INTEGER NOT NULL,
+        responses INTEGER NOT NULL,
+        PRIMARY KEY (team_id, week)
+    ) WITHOUT ROWID
+    """)
+
+    if rebuild:
+        cursor = await db.execute("""
+            SELECT team_id, name, opponent, start_time_utc, minutes, attending, responses FROM scrim_history
         """)
+        await _add_to_stats(db, await cursor.fetchall())
 
-        # --- Users table ---
+async def _migrate_legacy_config(db):
+    """One-shot copy of the single-team config table into team 1."""
+    cursor = await db.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='config_legacy'"
+    )
+    if not await cursor.fetchone():
+        cursor = await db.execute("PRAGMA table_info(config)")
+        if "team_id" in {row[1] for row in await cursor.fetchall()}:
+            return
+        # Still the old (key PRIMARY KEY, value) table
+        await db.execute("ALTER TABLE config RENAME TO config_legacy")
         await db.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            timezone TEXT
-        )
+        CREATE TABLE config (
+            team_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            PRIMARY KEY (team_id, key)
+        ) WITHOUT ROWID
         """)
+    await db.execute(
+        f"INSERT OR IGNORE INTO config (team_id, key, value) SELECT {DEFAULT_TEAM_ID}, key, value FROM config_legacy"
+    )
+    await db.execute("DROP TABLE config_legacy")
+    print("Moved config into team-scoped rows")
 
-        # --- Attendance table ---
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS attendance (
-            scrim_id INTEGER,
-            user_id INTEGER,
-            PRIMARY KEY (scrim_id, user_id)
+
+async def _migrate_legacy_availability(db):
+    """One-shot copy of the old display-string availability table."""
+    cursor = await db.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='availability'"
+    )
+    if not await cursor.fetchone():
+        return
+
+    cursor = await db.execute("SELECT player_id, day, time, status FROM availability")
+    converted = []
+    for player_id, day, time, status in await cursor.fetchall():
+        try:
+            converted.append((
+                player_id,
+                day_label_to_iso(day),
+                slot_label_to_minute(time),
+                AVAILABILITY_STATUSES.index(status),
+            ))
+        except ValueError:
+            print(f"Skipping unreadable availability row: {player_id} {day!r} {time!r} {status!r}")
+
+    await db.executemany("""
+        INSERT OR REPLACE INTO availability_slots (player_id, day, minute, status)
+        VALUES (?, ?, ?, ?)
+    """, [row for row in converted if row[3]])
+    await db.execute("DROP TABLE availability")
+    print(f"Migrated {len(converted)} availability rows to availability_slots")
+
+
+async def _migrate_reminder_teams(db):
+    """
+    Version 2: the reminders ledger records each message's team, so a
+    reminder left over from a deleted scrim is still cleaned up in its
+    team's outbound lane. Existing rows take their scrim's team, else the
+    team whose channel they were posted in.
+    """
+    await db.execute(f"ALTER TABLE reminders ADD COLUMN team_id INTEGER NOT NULL DEFAULT {DEFAULT_TEAM_ID}")
+    await db.execute(f"""
+        UPDATE reminders SET team_id = COALESCE(
+            (SELECT team_id FROM scrims WHERE id = reminders.scrim_id),
+            (SELECT id FROM teams WHERE channel_id = reminders.channel_id),
+            {DEFAULT_TEAM_ID}
         )
-        """)
+    """)
 
-        # --- Config table ---
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS config (
-            key TEXT PRIMARY KEY,
-            value TEXT
+
+# Applied in order; PRAGMA user_version counts the steps a database has had.
+# Append a step for each schema change and never edit one that has shipped.
+MIGRATIONS = [_migrate_baseline, _migrate_reminder_teams]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+async def _schema_version(db) -> int:
+    cursor = await db.execute("PRAGMA user_version")
+    return (await cursor.fetchone())[0]
+
+@timed_query
+async def init_db():
+    """
+    Bring the database up to SCHEMA_VERSION. A current database costs one
+    PRAGMA read; otherwise each missing step runs in its own transaction
+    and nothing is dropped that still holds data.
+    """
+    async with read_db() as db:
+        if await _schema_version(db) >= SCHEMA_VERSION:
+            return
+    while True:
+        async with write_db() as db:
+            # The web workers and the bot may start together; whoever takes
+            # the write lock first migrates and the rest find the step done
+            await db.execute("BEGIN IMMEDIATE")
+            version = await _schema_version(db)
+            if version >= SCHEMA_VERSION:
+                return
+            await MIGRATIONS[version](db)
+            await db.execute(f"PRAGMA user_version = {version + 1}")
+        print(f"Migrated database schema to version {version + 1}")
+
+
+# --- Data version helpers ---
+def _version_name(name: str, team_id: int = None) -> str:
+    return name if team_id is None else f"{name}:{team_id}"
+
+async def bump_version(db, name: str, team_id: int = None) -> int:
+    """Mark `name` (of one team) as changed; call inside the write that changed it. Returns the new version."""
+    cursor = await db.execute("""
+        INSERT INTO data_versions (name, version, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+        RETURNING version
+    """, (_version_name(name, team_id), datetime.now(timezone.utc).isoformat()))
+    return (await cursor.fetchone())[0]
+
+async def _read_version(db, name: str, team_id: int = None) -> int:
+    cursor = await db.execute("SELECT version FROM data_versions WHERE name=?", (_version_name(name, team_id),))
+    row = await cursor.fetchone()
+    return row[0] if row else 0
+
+@timed_query
+async def get_version(name: str, team_id: int = None) -> int:
+    async with read_db() as db:
+        return await _read_version(db, name, team_id)
+
+@timed_query
+async def get_version_stamp(name: str, team_id: int = None):
+    """(version, UTC ISO time of the last bump or None) of `name`."""
+    async with read_db() as db:
+        cursor = await db.execute(
+            "SELECT version, updated_at FROM data_versions WHERE name=?", (_version_name(name, team_id),)
         )
-        """)
+        row = await cursor.fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+@timed_query
+async def get_team_versions(name: str) -> Dict[int, int]:
+    """Every team's version of `name` as {team_id: version}, in one read."""
+    async with read_db() as db:
+        cursor = await db.execute(
+            "SELECT name, version FROM data_versions WHERE name >= ? AND name < ?", (f"{name}:", f"{name};")
+        )
+        return {int(key.split(":")[1]): version for key, version in await cursor.fetchall()}
+
+
+# --- In-process caches ---
+# config and players change rarely but are read on every board refresh and
+# page load, so each team's rows are held here as (version, value). Writes
+# in this process update them write-through. Writes by other processes are
+# found by re-reading the version rows, at most every CACHE_CHECK_SECONDS
+# and only when PRAGMA data_version shows that something was committed.
+CACHE_CHECK_SECONDS = float(os.getenv("CACHE_CHECK_SECONDS", "1"))
+CACHED_TABLES = ("config", "players")
+
+_caches: Dict[str, Dict[int, tuple]] = {name: {} for name in CACHED_TABLES}
+_cache_check = {"at": 0.0, "data_version": None}
+
+def _cache_committed(cache: Dict[int, tuple], team_id: int, version: int, change=None):
+    """
+    Apply a committed write to a team's cached value when it is the next
+    version; otherwise something else wrote in between, so drop it.
+    `change` updates the value in place or returns its replacement.
+    """
+    cached = cache.pop(team_id, None)
+    if cached and cached[0] == version - 1:
+        value = change(cached[1]) if change else None
+        cache[team_id] = (version, cached[1] if value is None else value)
+
+async def check_caches(force: bool = False):
+    """
+    Drop cached teams whose version row has moved. Reads do this on their
+    own; `force` skips the wait, for callers that know another process wrote.
+    """
+    now = time.monotonic()
+    if not force and now - _cache_check["at"] < CACHE_CHECK_SECONDS:
+        return
+    _cache_check["at"] = now
+    data_version = await get_data_version()
+    if data_version == _cache_check["data_version"]:
+        return
+    _cache_check["data_version"] = data_version
+    ranges = " OR ".join("(name > ? AND name < ?)" for _ in CACHED_TABLES)
+    async with read_db() as db:
+        cursor = await db.execute(
+            f"SELECT name, version FROM data_versions WHERE {ranges}",
+            [bound for name in CACHED_TABLES for bound in (f"{name}:", f"{name};")]
+        )
+        versions = dict(await cursor.fetchall())
+    for name, cache in _caches.items():
+        for team_id, (version, _) in list(cache.items()):
+            if versions.get(_version_name(name, team_id), 0) != version:
+                del cache[team_id]
+
+async def _cached(name: str, team_id: int, load):
+    """A team's cached `name` value, loaded by `load(db)` on a miss."""
+    await check_caches()
+    cached = _caches[name].get(team_id)
+    if cached:
+        return cached[1]
+    async with read_db() as db:
+        # Version first: rows newer than it only cause one extra reload
+        version = await _read_version(db, name, team_id)
+        value = await load(db)
+    _caches[name][team_id] = (version, value)
+    return value
+
+
+# --- Scrim helpers ---
+SCRIM_COLUMNS = "id, name, start_time_utc, end_time_utc, contact, note, team_id"
+
+@timed_query
+async def get_upcoming_scrims(now: str, until: str = None, starts_from: str = None, limit: int = None,
+                             team_id: int = None):
+    """
+    Scrims of one team (or every team) that have not ended at `now`,
+    optionally only those starting in [starts_from, until), soonest first.
+    One-off scrims come from the time indexes; series occurrences are
+    expanded for the window only (up to SERIES_HORIZON_DAYS ahead when
+    there is no `until`) and merged in lazily, so `limit` stops the
+    expansion early.
+    """
+    query = f"SELECT {SCRIM_COLUMNS} FROM scrims WHERE end_time_utc > ?"
+    params = [now]
+    if team_id is not None:
+        query += " AND team_id = ?"
+        params.append(team_id)
+    if starts_from:
+        query += " AND start_time_utc >= ?"
+        params.append(starts_from)
+    if until:
+        query += " AND start_time_utc < ?"
+        params.append(until)
+
+    query += " ORDER BY start_time_utc ASC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    now_dt = datetime.fromisoformat(now)
+    lower = datetime.fromisoformat(starts_from) if starts_from else None
+    upper = (datetime.fromisoformat(until) if until
+             else max(now_dt, lower or now_dt) + timedelta(days=SERIES_HORIZON_DAYS))
+
+    async with read_db() as db:
+        cursor = await db.execute(query, params)
+        rows = await cursor.fetchall()
+        series, exceptions = await _read_series(db, now, upper.isoformat(), team_id=team_id)
+
+    occurrences = [
+        series_occurrences(row, exceptions.get(row[0], {}), now_dt, upper, lower)
+        for row in series
+    ]
+    merged = heapq.merge(rows, *occurrences, key=lambda row: row[2])
+    return list(itertools.islice(merged, limit))
+
+@timed_query
+async def get_scrim(scrim_id: int):
+    """One scrim or series occurrence as a SCRIM_COLUMNS row, or None."""
+    if not is_occurrence(scrim_id):
+        async with read_db() as db:
+            cursor = await db.execute(f"SELECT {SCRIM_COLUMNS} FROM scrims WHERE id = ?", (scrim_id,))
+            return await cursor.fetchone()
+
+    async with read_db() as db:
+        return await _read_occurrence(db, scrim_id)
+
+@timed_query
+async def add_scrim(name: str, start_utc: str, end_utc: str, contact: str = None, note: str = None,
+                    team_id: int = DEFAULT_TEAM_ID, check_overlap: bool = False) -> int:
+    """Add a one-off scrim; with `check_overlap`, raises OverlapError rather than double-book."""
+    async with write_db() as db:
+        if check_overlap:
+            conflicts = (await _find_overlaps(db, team_id, [(start_utc, end_utc)]))[0]
+            if conflicts:
+                raise OverlapError(conflicts)
+        cursor = await db.execute(
+            "INSERT INTO scrims (name, start_time_utc, end_time_utc, contact, note, team_id) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, start_utc, end_utc, contact, note, team_id)
+        )
+        scrim_id = cursor.lastrowid
+        await record_scrim_event(db, "added", scrim_id, team_id)
+        version = await bump_version(db, "scrims", team_id)
+    _cache_committed(_scrim_indexes, team_id, version, lambda index: index.add(scrim_id, to_seconds(start_utc), to_seconds(end_utc)))
+    return scrim_id
+
+@timed_query
+async def add_scrims(rows: List[tuple], team_id: int = DEFAULT_TEAM_ID, check_overlap: bool = False) -> List[int]:
+    """
+    Add many (name, start, end, contact, note) scrims with one executemany
+    and a single "imported" change event, so the bot redraws the board
+    once. With `check_overlap` the whole batch is refused (OverlapError)
+    if any scrim overlaps another in the batch or one already booked.
+    Returns the new ids in order.
+    """
+    rows = [tuple(row) for row in rows]
+    if not rows:
+        return []
+    if check_overlap:
+        batch = IntervalIndex()
+        for position, (name, start, end, contact, note) in enumerate(rows):
+            clash = batch.overlapping(to_seconds(start), to_seconds(end))
+            if clash:
+                earlier = rows[clash[0]]
+                raise OverlapError([(None,) + earlier + (team_id,)],
+                                   f"Rows {clash[0] + 1} and {position + 1} overlap")
+            batch.add(position, to_seconds(start), to_seconds(end))
+
+    async with write_db() as db:
+        if check_overlap:
+            found = await _find_overlaps(db, team_id, [(row[1], row[2]) for row in rows])
+            for position, conflicts in enumerate(found):
+                if conflicts:
+                    raise OverlapError(conflicts, f"Row {position + 1} overlaps {len(conflicts)} booked scrim(s)")
+        await db.executemany(
+            "INSERT INTO scrims (name, start_time_utc, end_time_utc, contact, note, team_id) VALUES (?, ?, ?, ?, ?, ?)",
+            [row + (team_id,) for row in rows]
+        )
+        # One transaction on the only writer, so the ids are consecutive
+        cursor = await db.execute("SELECT last_insert_rowid()")
+        last = (await cursor.fetchone())[0]
+        ids = list(range(last - len(rows) + 1, last + 1))
+        await record_scrim_event(db, "imported", ids[0], team_id)
+        version = await bump_version(db, "scrims", team_id)
+
+    def add_all(index):
+        for scrim_id, row in zip(ids, rows):
+            index.add(scrim_id, to_seconds(row[1]), to_seconds(row[2]))
+    _cache_committed(_scrim_indexes, team_id, version, add_all)
+    return ids
+
+async def _scrim_team(db, scrim_id: int, team_id: int = None):
+    """The scrim's team, or None if it is missing (or not in `team_id`)."""
+    cursor = await db.execute("SELECT team_id FROM scrims WHERE id = ?", (scrim_id,))
+    row = await cursor.fetchone()
+    if not row or (team_id is not None and row[0] != team_id):
+        return None
+    return row[0]
+
+@timed_query
+async def update_scrim(scrim_id: int, name: str, start_utc: str, end_utc: str, contact: str = None, note: str = None,
+                       team_id: int = None, check_overlap: bool = False) -> bool:
+    """
+    Edit a scrim (only if it belongs to `team_id`, when given); editing a
+    series occurrence stores an exception for it. With `check_overlap`,
+    raises OverlapError if the new time overlaps another scrim.
+    """
+    if is_occurrence(scrim_id):
+        return await _save_series_exception(scrim_id, (name, start_utc, end_utc, contact, note), team_id,
+                                            check_overlap)
+    async with write_db() as db:
+        team_id = await _scrim_team(db, scrim_id, team_id)
+        if team_id is None:
+            return False
+        if check_overlap:
+            conflicts = (await _find_overlaps(db, team_id, [(start_utc, end_utc)], exclude=scrim_id))[0]
+            if conflicts:
+                raise OverlapError(conflicts)
+        await db.execute(
+            """UPDATE scrims
+               SET name = ?, start_time_utc = ?, end_time_utc = ?, contact = ?, note = ?
+               WHERE id = ?""",
+            (name, start_utc, end_utc, contact, note, scrim_id)
+        )
+        await record_scrim_event(db, "edited", scrim_id, team_id)
+        version = await bump_version(db, "scrims", team_id)
+    _cache_committed(_scrim_indexes, team_id, version, lambda index: index.add(scrim_id, to_seconds(start_utc), to_seconds(end_utc)))
+    return True
+
+@timed_query
+async def delete_scrim(scrim_id: int, team_id: int = None) -> bool:
+    """Delete a scrim; deleting a series occurrence skips just that date."""
+    if is_occurrence(scrim_id):
+        return await _save_series_exception(scrim_id, None, team_id)
+    async with write_db() as db:
+        team_id = await _scrim_team(db, scrim_id, team_id)
+        if team_id is None:
+            return False
+        await db.execute("DELETE FROM scrims WHERE id = ?", (scrim_id,))
+        await db.execute("DELETE FROM attendance WHERE scrim_id = ?", (scrim_id,))
+        await record_scrim_event(db, "deleted", scrim_id, team_id)
+        version = await bump_version(db, "scrims", team_id)
+    _cache_committed(_scrim_indexes, team_id, version, lambda index: index.remove(scrim_id))
+    return True
+
+# --- Overlap checks ---
+class OverlapError(ValueError):
+    """A booking would overlap scrims the team already has (or another row of a batch)."""
+
+    def __init__(self, conflicts: List[tuple], message: str = None):
+        super().__init__(message or f"Overlaps {len(conflicts)} booked scrim(s)")
+        self.conflicts = conflicts  # SCRIM_COLUMNS rows, soonest first
+
+# team_id -> (scrims version, IntervalIndex of the team's scrims rows). Writes
+# here move an index along with the version they commit (_cache_committed);
+# a version it has not seen (another process wrote) reloads it on the next
+# check.
+_scrim_indexes: Dict[int, tuple] = {}
 
-        # --- Players table ---
+async def _scrim_index(db, team_id: int) -> IntervalIndex:
+    version = await _read_version(db, "scrims", team_id)
+    cached = _scrim_indexes.get(team_id)
+    if cached and cached[0] == version:
+        return cached[1]
+    cursor = await db.execute("SELECT id, start_time_utc, end_time_utc FROM scrims WHERE team_id = ?", (team_id,))
+    index = IntervalIndex(
+        (scrim_id, to_seconds(start), to_seconds(end)) for scrim_id, start, end in await cursor.fetchall()
+    )
+    _scrim_indexes[team_id] = (version, index)
+    return index
+
+async def _find_overlaps(db, team_id: int, windows: List[tuple], exclude: int = None) -> List[List[tuple]]:
+    """
+    For each (start, end) UTC ISO window, the team's scrims and series
+    occurrences (SCRIM_COLUMNS rows) it overlaps, leaving out `exclude`.
+    Call on the writer so the check and the write are one step.
+    """
+    spans = [(to_seconds(start), to_seconds(end)) for start, end in windows]
+    index = await _scrim_index(db, team_id)
+    found = [index.overlapping(start, end, exclude) for start, end in spans]
+
+    rows = {}
+    ids = set().union(*found)
+    if ids:
+        cursor = await db.execute(
+            f"SELECT {SCRIM_COLUMNS} FROM scrims WHERE id IN ({','.join('?' * len(ids))})", list(ids)
+        )
+        rows = {row[0]: row for row in await cursor.fetchall()}
+
+    # Occurrences are not stored, so series are expanded over the windows' span
+    lower = datetime.fromtimestamp(min(start for start, _ in spans), timezone.utc)
+    upper = datetime.fromtimestamp(max(end for _, end in spans), timezone.utc)
+    series, exceptions = await _read_series(db, lower.isoformat(), upper.isoformat(), team_id=team_id)
+    if series:
+        occurrences = IntervalIndex()
+        for row in series:
+            for occurrence in series_occurrences(row, exceptions.get(row[0], {}), lower, upper):
+                rows[occurrence[0]] = occurrence
+                occurrences.add(occurrence[0], to_seconds(occurrence[2]), to_seconds(occurrence[3]))
+        for position, (start, end) in enumerate(spans):
+            found[position] = found[position] + occurrences.overlapping(start, end, exclude)
+
+    # A stale index can name a row that is gone; it is no conflict
+    return [sorted((rows[item_id] for item_id in hits if item_id in rows), key=lambda row: row[2]) for hits in found]
+
+# --- History helpers ---
+def opponent_key(name: str) -> str:
+    return " ".join(name.lower().split())
+
+def _week_of(start_utc: str, zone) -> str:
+    day = datetime.fromisoformat(start_utc).astimezone(zone).date()
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+@timed_query
+async def archive_ended_scrims(now: str, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Move up to `batch_size` ended scrims, plus the series occurrences that
+    ended since the last run, into scrim_history in one transaction, adding
+    them to the per-opponent and per-week summaries as they go. Returns how
+    many were archived; call again while that is at least `batch_size`.
+    """
+    async with write_db() as db:
+        cursor = await db.execute("""
+            SELECT id, name, start_time_utc, end_time_utc, team_id FROM scrims
+            WHERE end_time_utc <= ? ORDER BY end_time_utc LIMIT ?
+        """, (now, batch_size))
+        ended = list(await cursor.fetchall())
+        ended += await _ended_occurrences(db, now)
+
+        # Exceptions for occurrences that are over are never read again
+        yesterday = (datetime.fromisoformat(now) - timedelta(days=1)).isoformat()
         await db.execute("""
-        CREATE TABLE IF NOT EXISTS players (
-            id INTEGER PRIMARY KEY,       -- 1 to 6
-            name TEXT NOT NULL
+            DELETE FROM scrim_series_exceptions
+            WHERE occurrence_start <= ? AND (end_time_utc IS NULL OR end_time_utc <= ?)
+        """, (yesterday, now))
+        if not ended:
+            return 0
+
+        ids = [row[0] for row in ended]
+        marks = ",".join("?" * len(ids))
+        cursor = await db.execute(f"""
+            SELECT scrim_id, SUM(status = {ATTENDING}), COUNT(*) FROM attendance
+            WHERE scrim_id IN ({marks}) GROUP BY scrim_id
+        """, ids)
+        rsvps = {scrim_id: (attending, responses) for scrim_id, attending, responses in await cursor.fetchall()}
+
+        history = []
+        for scrim_id, name, start, end, team_id in ended:
+            minutes = int((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds() // 60)
+            attending, responses = rsvps.get(scrim_id, (0, 0))
+            history.append((scrim_id, team_id, name, opponent_key(name), start, minutes, attending, responses))
+
+        await db.executemany("""
+            INSERT INTO scrim_history (id, team_id, name, opponent, start_time_utc, minutes, attending, responses)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, history)
+        await _add_to_stats(db, [row[1:] for row in history])
+
+        await db.execute(f"DELETE FROM scrims WHERE id IN ({marks})", ids)
+        await db.execute(f"DELETE FROM attendance WHERE scrim_id IN ({marks})", ids)
+        # The scrims version moves too, so every process drops the archived
+        # rows from its overlap index
+        versions = {}
+        for team_id in {row[1] for row in history}:
+            await bump_version(db, "history", team_id)
+            versions[team_id] = await bump_version(db, "scrims", team_id)
+
+    def remove_archived(index):
+        for scrim_id in ids:
+            index.remove(scrim_id)
+    for team_id, version in versions.items():
+        _cache_committed(_scrim_indexes, team_id, version, remove_archived)
+    return len(ended)
+
+async def _add_to_stats(db, rows):
+    """Fold (team_id, name, opponent, start, minutes, attending, responses) rows into the summaries."""
+    zone = get_zone(DEFAULT_TIMEZONE)
+    opponents, weeks = {}, {}
+    for team_id, name, opponent, start, minutes, attending, responses in rows:
+        totals = (1, minutes, attending, responses)
+        entry = opponents.setdefault((team_id, opponent), [name, 0, 0, 0, 0, start])
+        entry[1:5] = [a + b for a, b in zip(entry[1:5], totals)]
+        if start >= entry[5]:
+            entry[0], entry[5] = name, start
+        week = weeks.setdefault((team_id, _week_of(start, zone)), [0, 0, 0, 0])
+        week[:] = [a + b for a, b in zip(week, totals)]
+
+    await db.executemany("""
+        INSERT INTO scrim_stats_opponents (team_id, opponent, name, scrims, minutes, attending, responses, last_played)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(team_id, opponent) DO UPDATE SET
+            scrims = scrims + excluded.scrims,
+            minutes = minutes + excluded.minutes,
+            attending = attending + excluded.attending,
+            responses = responses + excluded.responses,
+            name = CASE WHEN excluded.last_played >= last_played THEN excluded.name ELSE name END,
+            last_played = MAX(last_played, excluded.last_played)
+    """, [key + tuple(entry) for key, entry in opponents.items()])
+    await db.executemany("""
+        INSERT INTO scrim_stats_weeks (team_id, week, scrims, minutes, attending, responses)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(team_id, week) DO UPDATE SET
+            scrims = scrims + excluded.scrims,
+            minutes = minutes + excluded.minutes,
+            attending = attending + excluded.attending,
+            responses = responses + excluded.responses
+    """, [key + tuple(entry) for key, entry in weeks.items()])
+
+async def _ended_occurrences(db, now: str):
+    """
+    (id, name, start, end, team_id) of series occurrences that ended after
+    the series_archived_until watermark and by `now`. The first run only
+    sets the watermark, so old series are not back-filled. It only moves
+    when something ended, so a pass with nothing to archive writes nothing
+    (and leaves PRAGMA data_version alone for the other processes).
+    """
+    cursor = await db.execute(
+        "SELECT value FROM config WHERE team_id=? AND key='series_archived_until'", (GLOBAL_CONFIG_TEAM,)
+    )
+    row = await cursor.fetchone()
+    if row and row[0] >= now:
+        return []
+
+    ended = []
+    if row:
+        since, until = datetime.fromisoformat(row[0]), datetime.fromisoformat(now)
+        series, exceptions = await _read_series(db, row[0], now)
+        for item in series:
+            for scrim_id, name, start, end, contact, note, team_id in series_occurrences(
+                    item, exceptions.get(item[0], {}), since, until):
+                if end <= now:
+                    ended.append((scrim_id, name, start, end, team_id))
+    if ended or not row:
+        await db.execute(
+            "INSERT OR REPLACE INTO config(team_id, key, value) VALUES(?, 'series_archived_until', ?)",
+            (GLOBAL_CONFIG_TEAM, now)
         )
-        """)
+    return ended
+
+@timed_query
+async def get_scrim_stats(team_id: int = DEFAULT_TEAM_ID, weeks: int = 12, opponents: int = 50) -> Dict:
+    """A team's totals, busiest opponents and latest weeks, read from the summary tables only."""
+    async with read_db() as db:
+        cursor = await db.execute("""
+            SELECT opponent, name, scrims, minutes, attending, responses, last_played
+            FROM scrim_stats_opponents WHERE team_id = ? ORDER BY scrims DESC, last_played DESC LIMIT ?
+        """, (team_id, opponents))
+        opponent_rows = await cursor.fetchall()
+        cursor = await db.execute("""
+            SELECT week, scrims, minutes, attending, responses
+            FROM scrim_stats_weeks WHERE team_id = ? ORDER BY week DESC LIMIT ?
+        """, (team_id, weeks))
+        week_rows = await cursor.fetchall()
+        cursor = await db.execute("""
+            SELECT COUNT(*), COALESCE(SUM(scrims), 0), COALESCE(SUM(minutes), 0),
+                   COALESCE(SUM(attending), 0), COALESCE(SUM(responses), 0)
+            FROM scrim_stats_opponents WHERE team_id = ?
+        """, (team_id,))
+        opponent_count, scrims, minutes, attending, responses = await cursor.fetchone()
+
+    def summary(scrims, minutes, attending, responses):
+        return {
+            "scrims": scrims,
+            "hours": round(minutes / 60, 1),
+            "attending": attending,
+            "responses": responses,
+            "attendance_rate": round(attending / responses, 3) if responses else None,
+        }
+
+    return {
+        "totals": dict(summary(scrims, minutes, attending, responses), opponents=opponent_count),
+        "opponents": [
+            dict(summary(*row[2:6]), opponent=row[0], name=row[1], last_played=row[6])
+            for row in opponent_rows
+        ],
+        "weeks": [dict(summary(*row[1:5]), week=row[0]) for row in week_rows],
+    }
+
 
-        # Seed default 6 players if table empty
-        cursor = await db.execute("SELECT COUNT(*) FROM players")
-        count = (await cursor.fetchone())[0]
-        if count == 0:
-            for i in range(1, 7):
-                await db.execute("""
-                INSERT INTO players (id, name) VALUES (?, ?)
-                """, (i, f"Player {i}"))
+# --- Series helpers ---
+async def _read_series(db, ends_after: str, starts_before: str, team_id: int = None):
+    """
+    Series (of one team, or every team) that can have occurrences in the
+    window, plus their exceptions as {series_id: {original start:
+    replacement row or None}}.
+    """
+    query = f"""
+        SELECT {SERIES_COLUMNS} FROM scrim_series
+        WHERE first_start_utc < ? AND (last_end_utc IS NULL OR last_end_utc > ?)
+    """
+    params = [starts_before, ends_after]
+    if team_id is not None:
+        query += " AND team_id = ?"
+        params.append(team_id)
+    cursor = await db.execute(query, params)
+    series = await cursor.fetchall()
+
+    exceptions = {}
+    if series:
+        # Padded by a day so an occurrence moved across the window edge is seen
+        lower = (datetime.fromisoformat(ends_after) - timedelta(days=1)).isoformat()
+        upper = (datetime.fromisoformat(starts_before) + timedelta(days=1)).isoformat()
+        cursor = await db.execute("""
+            SELECT series_id, occurrence_start, name, start_time_utc, end_time_utc, contact, note
+            FROM scrim_series_exceptions WHERE occurrence_start >= ? AND occurrence_start < ?
+        """, (lower, upper))
+        for sid, original, name, start, end, contact, note in await cursor.fetchall():
+            exceptions.setdefault(sid, {})[original] = (name, start, end, contact, note) if start else None
+    return series, exceptions
 
-        # --- Availability table ---
+async def _read_occurrence(db, scrim_id: int):
+    series_id, start_utc = split_occurrence_id(scrim_id)
+    cursor = await db.execute(f"SELECT {SERIES_COLUMNS} FROM scrim_series WHERE id = ?", (series_id,))
+    series = await cursor.fetchone()
+    if not series:
+        return None
+    cursor = await db.execute("""
+        SELECT name, start_time_utc, end_time_utc, contact, note FROM scrim_series_exceptions
+        WHERE series_id = ? AND occurrence_start = ?
+    """, (series_id, start_utc.isoformat()))
+    exception = await cursor.fetchone()
+    team_id = series[8]
+    if exception:
+        return (scrim_id,) + tuple(exception) + (team_id,) if exception[1] else None
+    if not occurs_at(series, start_utc):
+        return None
+    end_utc = start_utc + timedelta(minutes=series[3])
+    return (scrim_id, series[1], start_utc.isoformat(), end_utc.isoformat(), series[6], series[7], team_id)
+
+async def _save_series_exception(scrim_id: int, row, team_id: int = None, check_overlap: bool = False) -> bool:
+    """Replace one occurrence with `row` (name, start, end, contact, note), or skip it with None."""
+    series_id, start_utc = split_occurrence_id(scrim_id)
+    async with write_db() as db:
+        occurrence = await _read_occurrence(db, scrim_id)
+        if occurrence is None or (team_id is not None and occurrence[6] != team_id):
+            return False
+        team_id = occurrence[6]
+        if row and check_overlap:
+            conflicts = (await _find_overlaps(db, team_id, [row[1:3]], exclude=scrim_id))[0]
+            if conflicts:
+                raise OverlapError(conflicts)
         await db.execute("""
-        CREATE TABLE IF NOT EXISTS availability (
-            player_id INTEGER,
-            day TEXT,
-            time TEXT,
-            status TEXT,
-            PRIMARY KEY (player_id, day, time),
-            FOREIGN KEY (player_id) REFERENCES players(id)
+            INSERT OR REPLACE INTO scrim_series_exceptions
+            (series_id, occurrence_start, name, start_time_utc, end_time_utc, contact, note)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (series_id, start_utc.isoformat()) + (row or (None,) * 5))
+        if row is None:
+            await db.execute("DELETE FROM attendance WHERE scrim_id = ?", (scrim_id,))
+        await record_scrim_event(db, "edited" if row else "deleted", scrim_id, team_id)
+        version = await bump_version(db, "scrims", team_id)
+    _cache_committed(_scrim_indexes, team_id, version)
+    return True
+
+@timed_query
+async def add_series(name: str, dtstart: datetime, duration_minutes: int, tz_name: str, rule: str,
+                     contact: str = None, note: str = None, team_id: int = DEFAULT_TEAM_ID) -> int:
+    """
+    Store a recurring scrim. `dtstart` is the naive wall-clock first start in
+    `tz_name`; raises ValueError for an unknown zone or an unusable rule.
+    """
+    zone = get_zone(tz_name)
+    parsed = parse_rule(rule, dtstart)
+    first = parsed.after(dtstart, inc=True)
+    if first is None:
+        raise ValueError("The rule never produces a scrim")
+    duration = timedelta(minutes=duration_minutes)
+    first_start_utc = first.replace(tzinfo=zone).astimezone(timezone.utc).isoformat()
+
+    async with write_db() as db:
+        cursor = await db.execute("""
+            INSERT INTO scrim_series
+            (name, dtstart, duration_minutes, timezone, rule, contact, note, first_start_utc, last_end_utc, team_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (name, dtstart.isoformat(), duration_minutes, tz_name, rule, contact, note,
+              first_start_utc, last_end(parsed, duration, zone), team_id))
+        series_id = cursor.lastrowid
+        await record_scrim_event(db, "series", series_id, team_id)
+        version = await bump_version(db, "scrims", team_id)
+    _cache_committed(_scrim_indexes, team_id, version)
+    return series_id
+
+@timed_query
+async def get_series_list(team_id: int = DEFAULT_TEAM_ID):
+    async with read_db() as db:
+        cursor = await db.execute(
+            f"SELECT {SERIES_COLUMNS}, first_start_utc, last_end_utc FROM scrim_series WHERE team_id = ? ORDER BY id",
+            (team_id,)
+        )
+        columns = SERIES_COLUMNS.split(", ") + ["first_start_utc", "last_end_utc"]
+        return [dict(zip(columns, row)) for row in await cursor.fetchall()]
+
+@timed_query
+async def delete_series(series_id: int, team_id: int = None) -> bool:
+    """Delete a series with its exceptions and every occurrence's RSVPs."""
+    async with write_db() as db:
+        cursor = await db.execute("SELECT team_id FROM scrim_series WHERE id = ?", (series_id,))
+        row = await cursor.fetchone()
+        if not row or (team_id is not None and row[0] != team_id):
+            return False
+        team_id = row[0]
+        await db.execute("DELETE FROM scrim_series WHERE id = ?", (series_id,))
+        await db.execute("DELETE FROM scrim_series_exceptions WHERE series_id = ?", (series_id,))
+        # Occurrence ids of one series form a contiguous negative range
+        await db.execute(
+            "DELETE FROM attendance WHERE scrim_id BETWEEN ? AND ?",
+            (-((series_id + 1) << 32) + 1, -(series_id << 32))
         )
+        await record_scrim_event(db, "series", series_id, team_id)
+        version = await bump_version(db, "scrims", team_id)
+    _cache_committed(_scrim_indexes, team_id, version)
+    return True
+
+
+# --- Attendance helpers ---
+ATTENDING = 1
+NOT_ATTENDING = 0
+
+@timed_query
+async def get_attendance(since: str):
+    """
+    (scrim_id, user_id, status) for every scrim that has not ended at
+    `since`, and for series occurrences that started in the last day.
+    """
+    async with read_db() as db:
+        cursor = await db.execute("""
+            SELECT a.scrim_id, a.user_id, a.status
+            FROM scrims s JOIN attendance a ON a.scrim_id = s.id
+            WHERE s.end_time_utc > ?
+        """, (since,))
+        rows = await cursor.fetchall()
+        cursor = await db.execute("SELECT scrim_id, user_id, status FROM attendance WHERE scrim_id < 0")
+        occurrence_rows = await cursor.fetchall()
+    cutoff = datetime.fromisoformat(since) - timedelta(days=1)
+    return rows + [row for row in occurrence_rows if split_occurrence_id(row[0])[1] > cutoff]
+
+@timed_query
+async def save_attendance(rows: List[tuple]):
+    """Upsert (scrim_id, user_id, status) RSVPs in one transaction."""
+    async with write_db() as db:
+        await db.executemany("""
+            INSERT INTO attendance (scrim_id, user_id, status) VALUES (?, ?, ?)
+            ON CONFLICT(scrim_id, user_id) DO UPDATE SET status=excluded.status
+        """, rows)
+        await bump_version(db, "attendance")
+
+@timed_query
+async def get_user_scrims(user_id: int, status: int = ATTENDING) -> set:
+    """Ids of the scrims a user has answered `status` to."""
+    async with read_db() as db:
+        cursor = await db.execute(
+            "SELECT scrim_id FROM attendance WHERE user_id = ? AND status = ?", (user_id, status)
+        )
+        return {row[0] for row in await cursor.fetchall()}
+
+
+# --- Reminder ledger helpers ---
+@timed_query
+async def record_reminder(scrim_id: int, minutes: int, channel_id: int, message_id: int,
+                          team_id: int = DEFAULT_TEAM_ID):
+    async with write_db() as db:
+        await db.execute("""
+            INSERT OR REPLACE INTO reminders (scrim_id, minutes, channel_id, message_id, sent_at, team_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (scrim_id, minutes, channel_id, message_id, datetime.now(timezone.utc).isoformat(), team_id))
+
+@timed_query
+async def forget_reminders(scrim_id: int, minutes: List[int] = None):
+    """Drop ledger rows for a scrim (all kinds, or only `minutes`)."""
+    async with write_db() as db:
+        if minutes is None:
+            await db.execute("DELETE FROM reminders WHERE scrim_id=?", (scrim_id,))
+        else:
+            await db.executemany(
+                "DELETE FROM reminders WHERE scrim_id=? AND minutes=?",
+                [(scrim_id, m) for m in minutes]
+            )
+
+@timed_query
+async def get_reminder_ledger():
+    """Every ledger row with its team and its scrim's start time (None if the scrim is gone)."""
+    async with read_db() as db:
+        cursor = await db.execute("""
+            SELECT r.scrim_id, r.minutes, r.channel_id, r.message_id, r.team_id, s.start_time_utc
+            FROM reminders r LEFT JOIN scrims s ON s.id = r.scrim_id
         """)
+        rows = await cursor.fetchall()
+        ledger = []
+        for scrim_id, minutes, channel_id, message_id, team_id, start in rows:
+            if is_occurrence(scrim_id):
+                occurrence = await _read_occurrence(db, scrim_id)
+                start = occurrence[2] if occurrence else None
+            ledger.append((scrim_id, minutes, channel_id, message_id, team_id, start))
+        return ledger
+
+
+# --- Change feed helpers ---
+async def record_scrim_event(db, kind: str, scrim_id: int, team_id: int = DEFAULT_TEAM_ID):
+    """Queue a change for the bot; call inside the write that made the change."""
+    await db.execute(
+        "INSERT INTO scrim_events (kind, scrim_id, team_id, created_at) VALUES (?, ?, ?, ?)",
+        (kind, scrim_id, team_id, datetime.now(timezone.utc).isoformat())
+    )
 
-        await db.commit()
+@timed_query
+async def fetch_scrim_events(limit: int = 200):
+    async with read_db() as db:
+        cursor = await db.execute(
+            "SELECT id, kind, scrim_id, team_id FROM scrim_events ORDER BY id ASC LIMIT ?", (limit,)
+        )
+        return await cursor.fetchall()
+
+@timed_query
+async def ack_scrim_events(last_id: int):
+    """Drop events up to and including `last_id` once they have been applied."""
+    async with write_db() as db:
+        await db.execute("DELETE FROM scrim_events WHERE id <= ?", (last_id,))
 
 
 # --- Config helpers ---
-async def set_config(key: str, value: str):
-    async with aiosqlite.connect(DB) as db:
+@timed_query
+async def set_config(key: str, value: str, team_id: int = DEFAULT_TEAM_ID):
+    async with write_db() as db:
         await db.execute(
-            "INSERT OR REPLACE INTO config(key, value) VALUES(?, ?)",
-            (key, value)
+            "INSERT OR REPLACE INTO config(team_id, key, value) VALUES(?, ?, ?)",
+            (team_id, key, value)
         )
-        await db.commit()
+        version = await bump_version(db, "config", team_id)
+    _cache_committed(_caches["config"], team_id, version, lambda values: {**values, key: value})
+
+async def _load_config(db, team_id: int) -> Dict[str, str]:
+    cursor = await db.execute("SELECT key, value FROM config WHERE team_id=?", (team_id,))
+    return dict(await cursor.fetchall())
 
-async def get_config(key: str):
-    async with aiosqlite.connect(DB) as db:
-        cursor = await db.execute("SELECT value FROM config WHERE key=?", (key,))
+@timed_query
+async def get_config(key: str, team_id: int = DEFAULT_TEAM_ID):
+    """A team's config value, from the in-process cache."""
+    values = await _cached("config", team_id, lambda db: _load_config(db, team_id))
+    return values.get(key)
+
+
+# --- Team helpers ---
+# A team is one guild's roster, schedule and board channel. Team 1 is the
+# original single-tenant install; the rest register through /setup.
+TEAM_COLUMNS = "id, name, guild_id, channel_id"
+
+def _team_dict(row) -> Dict:
+    return {"id": row[0], "name": row[1], "guild_id": row[2], "channel_id": row[3]}
+
+@timed_query
+async def get_teams() -> List[Dict]:
+    async with read_db() as db:
+        cursor = await db.execute(f"SELECT {TEAM_COLUMNS} FROM teams ORDER BY id")
+        return [_team_dict(r) for r in await cursor.fetchall()]
+
+@timed_query
+async def get_team(team_id: int):
+    async with read_db() as db:
+        cursor = await db.execute(f"SELECT {TEAM_COLUMNS} FROM teams WHERE id=?", (team_id,))
+        row = await cursor.fetchone()
+        return _team_dict(row) if row else None
+
+@timed_query
+async def save_team(name: str, guild_id: int, channel_id: int = None) -> int:
+    """Create the guild's team, or rename/re-point it; returns the team id."""
+    async with write_db() as db:
+        await db.execute("""
+            INSERT INTO teams (name, guild_id, channel_id) VALUES (?, ?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET name=excluded.name, channel_id=excluded.channel_id
+        """, (name, guild_id, channel_id))
+        cursor = await db.execute("SELECT id FROM teams WHERE guild_id=?", (guild_id,))
+        team_id = (await cursor.fetchone())[0]
+        await bump_version(db, "teams")
+    return team_id
+
+
+# --- User helpers ---
+@timed_query
+async def set_user_timezone(user_id: int, tz_name: str):
+    async with write_db() as db:
+        await db.execute("""
+            INSERT INTO users (user_id, timezone) VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET timezone=excluded.timezone
+        """, (user_id, tz_name))
+
+@timed_query
+async def get_user_timezone(user_id: int):
+    async with read_db() as db:
+        cursor = await db.execute("SELECT timezone FROM users WHERE user_id=?", (user_id,))
         row = await cursor.fetchone()
         return row[0] if row else None
 
 
 # --- Player helpers ---
-async def get_players():
-    async with aiosqlite.connect(DB) as db:
-        cursor = await db.execute("SELECT id, name FROM players ORDER BY id ASC")
-        rows = await cursor.fetchall()
-        return [{"id": r[0], "name": r[1]} for r in rows]
+async def _load_players(db, team_id: int) -> List[Dict]:
+    cursor = await db.execute("SELECT id, name FROM players WHERE team_id=? ORDER BY id ASC", (team_id,))
+    return [{"id": r[0], "name": r[1]} for r in await cursor.fetchall()]
+
+@timed_query
+async def get_players(team_id: int = DEFAULT_TEAM_ID) -> List[Dict]:
+    """
+    The team's roster, from the in-process cache. The list is shared, so
+    callers must not change it; writes here replace it instead.
+    """
+    return await _cached("players", team_id, lambda db: _load_players(db, team_id))
+
+async def update_player_name(player_id: int, name: str, team_id: int = DEFAULT_TEAM_ID):
+    await update_player_names([(player_id, name)], team_id)
+
+@timed_query
+async def update_player_names(renames: List[tuple], team_id: int = DEFAULT_TEAM_ID):
+    """Apply (player_id, name) renames in one transaction; other teams' players are left alone."""
+    async with write_db() as db:
+        await db.executemany(
+            "UPDATE players SET name=? WHERE id=? AND team_id=?",
+            [(name, int(player_id), team_id) for player_id, name in renames]
+        )
+        version = await bump_version(db, "players", team_id)
+    names = {int(player_id): name for player_id, name in renames}
+    _cache_committed(_caches["players"], team_id, version, lambda players: [
+        {"id": p["id"], "name": names.get(p["id"], p["name"])} for p in players
+    ])
+
+@timed_query
+async def add_players(names: List[str], team_id: int = DEFAULT_TEAM_ID) -> List[int]:
+    async with write_db() as db:
+        ids = []
+        for name in names:
+            cursor = await db.execute("INSERT INTO players (name, team_id) VALUES (?, ?)", (name, team_id))
+            ids.append(cursor.lastrowid)
+        version = await bump_version(db, "players", team_id)
+    _cache_committed(_caches["players"], team_id, version, lambda players: players + [
+        {"id": player_id, "name": name} for player_id, name in zip(ids, names)
+    ])
+    return ids
+
+@timed_query
+async def remove_players(player_ids: List[int], team_id: int = DEFAULT_TEAM_ID):
+    """Remove players from the roster along with their availability."""
+    params = [(int(player_id), team_id) for player_id in player_ids]
+    async with write_db() as db:
+        await db.executemany("DELETE FROM availability_slots WHERE player_id=? AND team_id=?", params)
+        await db.executemany("DELETE FROM players WHERE id=? AND team_id=?", params)
+        version = await bump_version(db, "players", team_id)
+    removed = {player_id for player_id, _ in params}
+    _cache_committed(_caches["players"], team_id, version, lambda players: [
+        p for p in players if p["id"] not in removed
+    ])
+
+
+# --- Availability format conversion ---
+# The pages and the API speak "Monday 30/12/2025" and "6PM"; storage uses
+# ISO dates and minute-of-day integers.
 
-async def update_player_name(player_id: int, name: str):
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("UPDATE players SET name=? WHERE id=?", (name, player_id))
-        await db.commit()
+def day_label_to_iso(label: str) -> str:
+    return datetime.strptime(label, DAY_LABEL_FORMAT).date().isoformat()
+
+def iso_to_day_label(iso: str) -> str:
+    return date.fromisoformat(iso).strftime(DAY_LABEL_FORMAT)
+
+def slot_label_to_minute(label: str) -> int:
+    if label in SLOT_MINUTES:
+        return SLOT_MINUTES[label]
+    match = _SLOT_LABEL.match(label.strip())
+    if not match:
+        raise ValueError(f"Unrecognised time slot: {label!r}")
+    hour, minute, meridiem = int(match[1]), int(match[2] or 0), (match[3] or "").upper()
+    if meridiem == "PM" and hour != 12:
+        hour += 12
+    elif meridiem == "AM" and hour == 12:
+        hour = 0
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Unrecognised time slot: {label!r}")
+    return hour * 60 + minute
+
+def minute_to_slot_label(minute: int) -> str:
+    hour, mins = divmod(minute % 1440, 60)
+    suffix = "AM" if hour < 12 else "PM"
+    hour = hour % 12 or 12
+    return f"{hour}{suffix}" if mins == 0 else f"{hour}:{mins:02d}{suffix}"
 
 
 # --- Availability helpers ---
 
-async def get_all_availability(date: str) -> Dict[int, Dict[str, Dict[str, str]]]:
+@timed_query
+async def get_availability_matrix(days: List[date], team_id: int = DEFAULT_TEAM_ID) -> Dict:
     """
-    Returns a dict like:
-    { player_id: { "Monday 30/12/2025": { "18:00": "available", ... } } }
+    Team availability for the given days from a single indexed query.
+
+    matrix[p][d][s] is an index into AVAILABILITY_STATUSES for player p,
+    day d and slot s; counts hold per day/slot totals for the team.
     """
-    async with aiosqlite.connect(DB) as db:
-        cursor = await db.execute("SELECT id, name FROM players")
-        players = await cursor.fetchall()
+    labels = [d.strftime(DAY_LABEL_FORMAT) for d in days]
+    day_index = {d.isoformat(): i for i, d in enumerate(days)}
+    slot_index = {SLOT_MINUTES[slot]: i for i, slot in enumerate(AVAILABILITY_SLOTS)}
 
-        result = {}
-        for player_id, _ in players:
-            cursor2 = await db.execute(
-                "SELECT time, status FROM availability WHERE player_id=? AND day=?",
-                (player_id, date)
-            )
-            slots = await cursor2.fetchall()
-            day_dict = {time: status for time, status in slots}
-            # Convert YYYY-MM-DD to "Monday DD/MM/YYYY"
-            day_str = datetime.strptime(date, "%Y-%m-%d").strftime("%A %d/%m/%Y")
-            result[player_id] = {day_str: day_dict}
-
-        return result
-    
-async def set_availability(player_id: int, day: str, time: str, status: str):
-    async with aiosqlite.connect(DB) as db:
-        if status == "none":
-            await db.execute(
-                "DELETE FROM availability WHERE player_id=? AND day=? AND time=?",
-                (player_id, day, time)
+    players = await get_players(team_id)
+    rows = []
+    if days:
+        async with read_db() as db:
+            cursor = await db.execute(
+                "SELECT player_id, day, minute, status FROM availability_slots"
+                " WHERE team_id=? AND day BETWEEN ? AND ?",
+                (team_id, min(days).isoformat(), max(days).isoformat())
             )
+            rows = await cursor.fetchall()
+
+    player_index = {p["id"]: i for i, p in enumerate(players)}
+    matrix = [[[0] * len(AVAILABILITY_SLOTS) for _ in days] for _ in players]
+    available = [[0] * len(AVAILABILITY_SLOTS) for _ in days]
+    unavailable = [[0] * len(AVAILABILITY_SLOTS) for _ in days]
+
+    for player_id, day, minute, code in rows:
+        p = player_index.get(player_id)
+        s = slot_index.get(minute)
+        d = day_index.get(day)
+        if p is None or s is None or d is None or code == 0:
+            continue
+        matrix[p][d][s] = code
+        if AVAILABILITY_STATUSES[code] == "available":
+            available[d][s] += 1
         else:
-            await db.execute("""
-                INSERT INTO availability (player_id, day, time, status)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(player_id, day, time) DO UPDATE SET status=excluded.status
-            """, (player_id, day, time, status))
-        await db.commit()
-
-async def get_availability(player_id: int):
-    async with aiosqlite.connect(DB) as db:
-        cursor = await db.execute(
-            "SELECT day, time, status FROM availability WHERE player_id=?",
-            (player_id,)
-        )
+            unavailable[d][s] += 1
+
+    return {
+        "days": [d.isoformat() for d in days],
+        "day_labels": labels,
+        "slots": AVAILABILITY_SLOTS,
+        "slot_minutes": [SLOT_MINUTES[s] for s in AVAILABILITY_SLOTS],
+        "statuses": AVAILABILITY_STATUSES,
+        "players": players,
+        "matrix": matrix,
+        "counts": {"available": available, "unavailable": unavailable},
+    }
+
+async def get_all_availability(date: str, team_id: int = DEFAULT_TEAM_ID) -> Dict[int, Dict[str, Dict[str, str]]]:
+    """
+    Returns a dict like:
+    { player_id: { "Monday 30/12/2025": { "6PM": "available", ... } } }
+    """
+    day = datetime.strptime(date, "%Y-%m-%d").date()
+    data = await get_availability_matrix([day], team_id)
+    label = data["day_labels"][0]
+
+    result = {}
+    for player, days in zip(data["players"], data["matrix"]):
+        result[player["id"]] = {label: {
+            AVAILABILITY_SLOTS[s]: AVAILABILITY_STATUSES[code]
+            for s, code in enumerate(days[0]) if code
+        }}
+    return result
+
+async def set_availability(player_id: int, day: str, time: str, status: str, team_id: int = DEFAULT_TEAM_ID):
+    """Set one cell; `day` and `time` use the display format ("Monday 30/12/2025", "6PM")."""
+    await set_availability_many([(player_id, day, time, status)], team_id)
+
+@timed_query
+async def set_availability_many(changes: List[tuple], team_id: int = DEFAULT_TEAM_ID):
+    """
+    Apply (player_id, day, time, status) cell changes in one transaction.
+    Later changes to the same cell win; "none" clears the cell. Raises
+    ValueError if a player is not on the team.
+    """
+    cells = {}
+    for player_id, day, time, status in changes:
+        key = (int(player_id), day_label_to_iso(day), slot_label_to_minute(time))
+        cells[key] = AVAILABILITY_STATUSES.index(status)
+
+    clears = [key for key, code in cells.items() if code == 0]
+    upserts = [key + (code, team_id) for key, code in cells.items() if code != 0]
+    player_ids = {key[0] for key in cells}
+
+    # Checked against the cached roster, so the writer lock is only held for
+    # the upserts; a miss rechecks first in case another process added them
+    if not player_ids <= {p["id"] for p in await get_players(team_id)}:
+        await check_caches(force=True)
+        if not player_ids <= {p["id"] for p in await get_players(team_id)}:
+            raise ValueError("Unknown player for this team")
+
+    async with write_db() as db:
+        if clears:
+            await db.executemany(
+                "DELETE FROM availability_slots WHERE player_id=? AND day=? AND minute=?",
+                clears
+            )
+        if upserts:
+            await db.executemany("""
+                INSERT INTO availability_slots (player_id, day, minute, status, team_id)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(player_id, day, minute) DO UPDATE SET status=excluded.status
+            """, upserts)
+    return len(cells)
+
+@timed_query
+async def get_availability(player_id: int, start: date = None, end: date = None):
+    """
+    A player's availability in display format, optionally limited to the
+    inclusive date range [start, end]:
+    { "Monday 30/12/2025": { "6PM": "available", ... } }
+    """
+    query = "SELECT day, minute, status FROM availability_slots WHERE player_id=?"
+    params = [player_id]
+    if start:
+        query += " AND day >= ?"
+        params.append(start.isoformat())
+    if end:
+        query += " AND day <= ?"
+        params.append(end.isoformat())
+
+    async with read_db() as db:
+        cursor = await db.execute(query + " ORDER BY day, minute", params)
         rows = await cursor.fetchall()
-        schedule = {}
-        for day, time, status in rows:
-            if day not in schedule:
-                schedule[day] = {}
-            schedule[day][time] = status
-        return schedule
+
+    schedule = {}
+    for day, minute, status in rows:
+        label = iso_to_day_label(day)
+        if label not in schedule:
+            schedule[label] = {}
+        schedule[label][minute_to_slot_label(minute)] = AVAILABILITY_STATUSES[status]
+    return schedule
 
 
 # --- Test DB creation ---
+async def _main():
+    await init_db()
+    await close_db()
+
 if __name__ == "__main__":
-    asyncio.run(init_db())
+    asyncio.run(_main())
     print(f"Database initialized at {DB}")
@@ -0,0 +1,62 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+
+def to_seconds(iso: str) -> int:
+    """Epoch seconds of an ISO time, the unit intervals are stored in."""
+    return int(datetime.fromisoformat(iso).timestamp())
+
+
+class IntervalIndex:
+    """
+    Half-open [start, end) intervals keyed by id, kept sorted by start.
+
+    An overlap query bisects to the starts that can reach the window (no
+    earlier than the window start minus the longest interval) and checks
+    only those ends, so it costs O(log n + k) rather than a scan. Scrims
+    are a few hours long, so k is the handful of neighbours.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, int]] = ()):
+        self._ends: Dict[int, int] = {}
+        self._starts: Dict[int, int] = {}
+        self._order: List[Tuple[int, int]] = []  # (start, id), sorted
+        # Only grows; a removed long interval just widens the search a little
+        self._longest = 0
+        for item_id, start, end in intervals:
+            self._ends[item_id] = end
+            self._starts[item_id] = start
+            self._order.append((start, item_id))
+            self._longest = max(self._longest, end - start)
+        self._order.sort()
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, item_id):
+        return item_id in self._ends
+
+    def add(self, item_id: int, start: int, end: int):
+        """Insert an interval, replacing the one stored under `item_id`."""
+        self.remove(item_id)
+        self._ends[item_id] = end
+        self._starts[item_id] = start
+        insort(self._order, (start, item_id))
+        self._longest = max(self._longest, end - start)
+
+    def remove(self, item_id: int):
+        start = self._starts.pop(item_id, None)
+        if start is None:
+            return
+        del self._ends[item_id]
+        del self._order[bisect_left(self._order, (start, item_id))]
+
+    def overlapping(self, start: int, end: int, exclude=None) -> List[int]:
+        """Ids of intervals sharing any time with [start, end), soonest first."""
+        first = bisect_left(self._order, (start - self._longest,))
+        last = bisect_left(self._order, (end,))
+        return [
+            item_id for _, item_id in self._order[first:last]
+            if self._ends[item_id] > start and item_id != exclude
+        ]
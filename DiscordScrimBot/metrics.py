@@ -0,0 +1,183 @@
+import asyncio
+import bisect
+import logging
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Tuple
+
+# Seconds; wide enough for both SQLite statements and Discord round trips
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_metrics = {}
+
+
+# --- Metric types ---
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        _metrics[name] = self
+
+    def _key(self, labels: Dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{self._label_text(key)} {_number(value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that is set, or read from `func` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), func: Callable[[], float] = None):
+        super().__init__(name, help, labels)
+        self.func = func
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def render(self):
+        if self.func is not None:
+            try:
+                self._values[()] = self.func()
+            except Exception:
+                self._values[()] = math.nan
+        yield from super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            # per-bucket counts (last is +Inf), then sum
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total) in sorted(self._values.items()):
+            running = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                running += count
+                le = 'le="' + ("+Inf" if bound == math.inf else _number(bound)) + '"'
+                yield f"{self.name}_bucket{self._label_text(key, le)} {running}"
+            yield f"{self.name}_sum{self._label_text(key)} {_number(total)}"
+            yield f"{self.name}_count{self._label_text(key)} {running}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# --- Exposition ---
+def render() -> str:
+    """Every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _metrics.values():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+async def serve(port: int, host: str = "0.0.0.0"):
+    """
+    Answer every HTTP request on `port` with render(). For processes without
+    a web server of their own (the bot in SCRIMBOT_MODE=external).
+    """
+    async def handle(reader, writer):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                + f"Content-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+# --- Event loop lag ---
+EVENT_LOOP_LAG = Histogram("event_loop_lag_seconds", "How late the event loop ran a timer that should have fired.")
+loop_lag = {"last": 0.0, "max": 0.0}
+
+async def monitor_event_loop(interval: float = 0.5):
+    """Measure how late a short sleep wakes; a busy loop wakes late."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - started - interval)
+        loop_lag["last"] = lag
+        loop_lag["max"] = max(loop_lag["max"], lag)
+        EVENT_LOOP_LAG.observe(lag)
+
+
+# --- Discord rate limits ---
+DISCORD_RATE_LIMITS = Counter(
+    "discord_rate_limits_total", "429 responses the Discord client had to wait out.", ("scope",)
+)
+
+class _RateLimitCounter(logging.Handler):
+    # discord.http only reports 429s through these warnings before retrying
+    def emit(self, record):
+        message = str(record.msg)
+        if message.startswith("We are being rate limited"):
+            DISCORD_RATE_LIMITS.inc(scope="bucket")
+        elif message.startswith("Global rate limit has been hit"):
+            DISCORD_RATE_LIMITS.inc(scope="global")
+
+def watch_discord_rate_limits():
+    logger = logging.getLogger("discord.http")
+    if not any(isinstance(handler, _RateLimitCounter) for handler in logger.handlers):
+        logger.addHandler(_RateLimitCounter(logging.WARNING))
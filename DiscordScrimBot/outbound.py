@@ -0,0 +1,184 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Hashable
+
+from metrics import Counter, Histogram
+
+# Lower runs first
+PRIORITY_REMINDER = 0
+PRIORITY_BOARD = 1
+PRIORITY_CLEANUP = 2
+
+PRIORITY_NAMES = {PRIORITY_REMINDER: "reminder", PRIORITY_BOARD: "board", PRIORITY_CLEANUP: "cleanup"}
+
+# Discord bulk delete takes 2-100 messages
+BULK_DELETE_MAX = 100
+
+REQUEST_SECONDS = Histogram(
+    "discord_request_duration_seconds", "Discord REST work per outbound job, including retries.", ("priority",)
+)
+QUEUE_SECONDS = Histogram(
+    "discord_queue_wait_seconds", "Time an outbound job waited for a worker.", ("priority",)
+)
+REQUEST_ERRORS = Counter(
+    "discord_request_errors_total", "Outbound jobs that raised.", ("priority", "error")
+)
+
+
+class _Job:
+    __slots__ = ("op", "key", "priority", "team", "queued_at", "futures", "superseded")
+
+    def __init__(self, op, key, priority, team):
+        self.op = op
+        self.key = key
+        self.priority = priority
+        self.team = team
+        self.queued_at = time.perf_counter()
+        self.futures = []
+        self.superseded = False
+
+
+class OutboundQueue:
+    """
+    Single path for every Discord REST write the bot makes.
+
+    Jobs run on a small pool of workers, lowest priority class first, and
+    worker 0 only ever takes reminders so a slow or rate-limited board edit
+    cannot hold one up. Within a priority class, jobs queue per `team` and
+    teams take turns, so one guild with a flood of work only delays its
+    own jobs. Submitting a job with the same `key` as one still queued
+    supersedes it: only the newest runs and every caller gets its result.
+    Message deletes are gathered per channel and bulk deleted.
+    """
+
+    def __init__(self, workers: int = 3):
+        self.worker_count = max(2, workers)
+        self._lanes = {}  # priority -> OrderedDict(team -> deque of jobs), in turn order
+        self._queued = {}
+        self._cond = asyncio.Condition()
+        self._deletes = {}
+        self._tasks = []
+
+    # --- Submitting ---
+    async def submit(self, priority: int, op: Callable[[], Awaitable], key: Hashable = None,
+                     team: Hashable = None):
+        """Queue `op` and wait for its result."""
+        return await self.enqueue(priority, op, key, team)
+
+    def enqueue(self, priority: int, op: Callable[[], Awaitable], key: Hashable = None,
+                team: Hashable = None) -> asyncio.Future:
+        """Queue `op` without waiting; the returned future resolves with its result."""
+        job = _Job(op, key, priority, team)
+        future = asyncio.get_running_loop().create_future()
+        job.futures.append(future)
+
+        previous = self._queued.get(key) if key is not None else None
+        if previous is not None:
+            previous.superseded = True
+            job.futures.extend(previous.futures)
+        if key is not None:
+            self._queued[key] = job
+
+        lanes = self._lanes.setdefault(priority, OrderedDict())
+        if team not in lanes:
+            lanes[team] = deque()
+        lanes[team].append(job)
+        asyncio.get_running_loop().create_task(self._notify())
+        return future
+
+    def delete(self, message, team: Hashable = None):
+        """Delete a message later, batched with other deletes in its channel."""
+        channel = message.channel
+        self._deletes.setdefault(channel.id, (channel, []))[1].append(message)
+        self.enqueue(PRIORITY_CLEANUP, lambda: self._flush_deletes(channel.id), key=("delete", channel.id), team=team)
+
+    async def _flush_deletes(self, channel_id):
+        channel, messages = self._deletes.pop(channel_id, (None, []))
+        for start in range(0, len(messages), BULK_DELETE_MAX):
+            chunk = messages[start:start + BULK_DELETE_MAX]
+            if len(chunk) > 1 and hasattr(channel, "delete_messages"):
+                try:
+                    await channel.delete_messages(chunk)
+                    continue
+                except Exception as e:
+                    # No Manage Messages permission, or messages older than 14 days
+                    print(f"Bulk delete failed ({e}), deleting one by one")
+            for message in chunk:
+                try:
+                    await message.delete()
+                except Exception as e:
+                    print(f"Failed to delete message {message.id}: {e}")
+
+    async def _notify(self):
+        async with self._cond:
+            self._cond.notify_all()
+
+    # --- Workers ---
+    def start(self):
+        if not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [
+                loop.create_task(self._worker(PRIORITY_REMINDER if i == 0 else PRIORITY_CLEANUP))
+                for i in range(self.worker_count)
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def backlog(self):
+        return sum(
+            1 for lanes in self._lanes.values() for jobs in lanes.values() for job in jobs if not job.superseded
+        )
+
+    def _next_job(self, max_priority):
+        """The next team's oldest job in the most urgent class, rotating that team to the back."""
+        for priority in sorted(self._lanes):
+            if priority > max_priority:
+                break
+            lanes = self._lanes[priority]
+            while lanes:
+                team, jobs = next(iter(lanes.items()))
+                while jobs and jobs[0].superseded:
+                    jobs.popleft()
+                if not jobs:
+                    del lanes[team]
+                    continue
+                job = jobs.popleft()
+                if jobs:
+                    lanes.move_to_end(team)
+                else:
+                    del lanes[team]
+                return job
+        return None
+
+    async def _worker(self, max_priority: int):
+        while True:
+            async with self._cond:
+                job = self._next_job(max_priority)
+                while job is None:
+                    await self._cond.wait()
+                    job = self._next_job(max_priority)
+                if job.key is not None and self._queued.get(job.key) is job:
+                    del self._queued[job.key]
+
+            label = PRIORITY_NAMES.get(job.priority, str(job.priority))
+            started = time.perf_counter()
+            QUEUE_SECONDS.observe(started - job.queued_at, priority=label)
+            try:
+                result = await job.op()
+            except Exception as e:
+                REQUEST_ERRORS.inc(priority=label, error=type(e).__name__)
+                for future in job.futures:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for future in job.futures:
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                REQUEST_SECONDS.observe(time.perf_counter() - started, priority=label)
@@ -0,0 +1,126 @@
+import heapq
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, Tuple
+
+from dateutil.rrule import DAILY, WEEKLY, rrule, rrulestr
+
+from tz import get_zone
+
+# Occurrences of a series have no scrims row, so each gets a synthetic
+# negative id: -(series_id << 32 | start minute since the epoch). It fits
+# the INTEGER scrim_id columns (attendance, reminders) and the bot's
+# scheduler, and decodes back to the occurrence without a lookup.
+_MINUTE_BITS = 32
+
+# Whole periods a rule without COUNT can be skipped ahead by
+_PERIODS = {DAILY: timedelta(days=1), WEEKLY: timedelta(weeks=1)}
+
+# Series columns, in the order series_occurrences() expects
+SERIES_COLUMNS = "id, name, dtstart, duration_minutes, timezone, rule, contact, note, team_id"
+
+
+# --- Occurrence ids ---
+def occurrence_id(series_id: int, start_utc: datetime) -> int:
+    return -((series_id << _MINUTE_BITS) | int(start_utc.timestamp() // 60))
+
+def is_occurrence(scrim_id: int) -> bool:
+    return scrim_id < 0
+
+def split_occurrence_id(scrim_id: int) -> Tuple[int, datetime]:
+    """(series_id, original UTC start) of an occurrence id."""
+    value = -scrim_id
+    minute = value & ((1 << _MINUTE_BITS) - 1)
+    return value >> _MINUTE_BITS, datetime.fromtimestamp(minute * 60, timezone.utc)
+
+
+# --- Rules ---
+def parse_rule(rule: str, dtstart: datetime):
+    """The dateutil rule for an RRULE string; raises ValueError if unreadable."""
+    try:
+        parsed = rrulestr(rule, dtstart=dtstart)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid recurrence rule {rule!r}: {e}")
+    if not isinstance(parsed, rrule):
+        raise ValueError("Only a single RRULE is supported; skip dates with exceptions instead")
+    return parsed
+
+def last_end(rule, duration: timedelta, zone) -> str:
+    """UTC ISO end of a bounded rule's final occurrence, None if it never stops."""
+    if not rule._count and not rule._until:
+        return None
+    occurrences = list(rule)
+    if not occurrences:
+        return None
+    return (occurrences[-1].replace(tzinfo=zone).astimezone(timezone.utc) + duration).isoformat()
+
+def _fast_forward(rule, dtstart: datetime, until: datetime):
+    """
+    Move a DAILY/WEEKLY rule's dtstart to the last whole period before
+    `until`, so expansion starts near the window instead of at the first
+    occurrence. Rules with COUNT are left alone: skipping would lose count.
+    """
+    period = _PERIODS.get(rule._freq)
+    if period is None or rule._count or until <= dtstart:
+        return rule
+    step = period * rule._interval
+    skipped = (until - dtstart) // step
+    if not skipped:
+        return rule
+    return rule.replace(dtstart=dtstart + step * skipped)
+
+
+# --- Expansion ---
+def series_occurrences(series, exceptions: Dict, ends_after: datetime, until: datetime,
+                       starts_from: datetime = None) -> Iterator[tuple]:
+    """
+    Lazily yield (id, name, start_utc, end_utc, contact, note, team_id) rows for one
+    series row (see SERIES_COLUMNS) that end after `ends_after` and start
+    before `until` (and at or after `starts_from`), soonest first.
+
+    Rules are expanded in the series' own zone so a 7PM scrim stays at 7PM
+    across daylight saving. `exceptions` maps an original UTC start to None
+    (skipped) or a replacement (name, start, end, contact, note) row; edited
+    rows are merged back in by their new start.
+    """
+    series_id, name, dtstart, duration_minutes, tz_name, rule_text, contact, note, team_id = series
+    zone = get_zone(tz_name)
+    duration = timedelta(minutes=duration_minutes)
+    first = datetime.fromisoformat(dtstart)
+
+    # Work in naive local time; pad a day either side for zone offsets
+    lowest = ends_after - duration if starts_from is None else max(starts_from, ends_after - duration)
+    window_start = lowest.astimezone(zone).replace(tzinfo=None) - timedelta(days=1)
+    window_end = until.astimezone(zone).replace(tzinfo=None) + timedelta(days=1)
+    rule = _fast_forward(parse_rule(rule_text, first), first, window_start)
+
+    def generated():
+        for local_start in rule.xafter(window_start, inc=True):
+            if local_start >= window_end:
+                return
+            start_utc = local_start.replace(tzinfo=zone).astimezone(timezone.utc)
+            start = start_utc.isoformat()
+            if start not in exceptions:
+                yield (occurrence_id(series_id, start_utc), name, start, (start_utc + duration).isoformat(),
+                       contact, note, team_id)
+
+    edited = sorted(
+        ((occurrence_id(series_id, datetime.fromisoformat(original)),) + row + (team_id,)
+         for original, row in exceptions.items() if row is not None),
+        key=lambda row: row[2],
+    )
+    lower = starts_from.isoformat() if starts_from else ""
+    upper, after = until.isoformat(), ends_after.isoformat()
+    for row in heapq.merge(generated(), edited, key=lambda row: row[2]):
+        if row[2] >= upper:
+            return
+        if row[2] >= lower and row[3] > after:
+            yield row
+
+def occurs_at(series, start_utc: datetime) -> bool:
+    """Whether the series' rule produces an occurrence starting at `start_utc`."""
+    series_id, name, dtstart, duration_minutes, tz_name, rule_text, contact, note, team_id = series
+    zone = get_zone(tz_name)
+    first = datetime.fromisoformat(dtstart)
+    local_start = start_utc.astimezone(zone).replace(tzinfo=None)
+    rule = _fast_forward(parse_rule(rule_text, first), first, local_start - timedelta(days=1))
+    return rule.after(local_start, inc=True) == local_start
@@ -0,0 +1,109 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Hashable
+
+
+class DeadlineScheduler:
+    """
+    Fires `handler(key, kind, fire_at)` at each scheduled deadline.
+
+    Deadlines live in a heap of (fire_at, seq, key, kind, generation). The
+    runner sleeps until the earliest one and is woken early when something
+    new is scheduled. Cancelling a key bumps its generation, so its stale
+    heap entries are dropped when they surface instead of being searched for.
+    """
+
+    def __init__(self, handler: Callable[[Hashable, str, datetime], Awaitable[None]]):
+        self.handler = handler
+        self._heap = []
+        self._generations = {}
+        self._counts = {}
+        self._live = 0
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task = None
+
+    # --- Scheduling ---
+    def schedule(self, fire_at: datetime, key: Hashable, kind: str):
+        generation = self._generations.setdefault(key, 0)
+        heapq.heappush(self._heap, (fire_at.timestamp(), next(self._seq), key, kind, generation))
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._live += 1
+        self._wake.set()
+
+    def cancel(self, key: Hashable):
+        """Drop every pending deadline for `key`."""
+        if key in self._generations:
+            self._generations[key] += 1
+            self._live -= self._counts.pop(key, 0)
+            self._compact()
+
+    def pending(self, key: Hashable = None):
+        """Pending (fire_at, key, kind) entries, soonest first."""
+        entries = sorted(entry for entry in self._heap if self._is_current(entry))
+        return [
+            (datetime.fromtimestamp(ts).astimezone(), k, kind)
+            for ts, _, k, kind, _ in entries
+            if key is None or k == key
+        ]
+
+    def _is_current(self, entry):
+        return self._generations.get(entry[2]) == entry[4]
+
+    def _compact(self):
+        # Rebuild once stale entries dominate so the heap stays small
+        if len(self._heap) > 2 * self._live + 16:
+            self._heap = [entry for entry in self._heap if self._is_current(entry)]
+            heapq.heapify(self._heap)
+            keep = {entry[2] for entry in self._heap}
+            self._generations = {k: g for k, g in self._generations.items() if k in keep}
+
+    # --- Lifecycle ---
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+
+            while self._heap and not self._is_current(self._heap[0]):
+                heapq.heappop(self._heap)
+
+            if not self._heap:
+                await self._wake.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            ts, _, key, kind, _ = heapq.heappop(self._heap)
+            self._live -= 1
+            self._counts[key] -= 1
+            if not self._counts[key]:
+                del self._counts[key]
+            try:
+                await self.handler(key, kind, datetime.fromtimestamp(ts).astimezone())
+            except Exception as e:
+                print(f"Scheduled {kind} for {key} failed: {e}")
@@ -0,0 +1,139 @@
+import math
+from datetime import date, timedelta
+from typing import Dict, List
+
+SLOT_LENGTH_MINUTES = 60
+
+
+# --- Bitset helpers ---
+# Each player's availability over the searched range is one int: bit
+# (day * slots_per_day + slot) is set when that cell has the status.
+
+def _player_bitsets(matrix: List[List[List[int]]], code: int) -> List[int]:
+    bitsets = []
+    for days in matrix:
+        bits = 0
+        pos = 0
+        for slots in days:
+            for value in slots:
+                if value == code:
+                    bits |= 1 << pos
+                pos += 1
+        bitsets.append(bits)
+    return bitsets
+
+def _start_mask(day_count: int, slots_per_day: int, width: int) -> int:
+    """Bits for every start slot whose window fits inside its own day."""
+    if width > slots_per_day:
+        return 0
+    day_bits = (1 << (slots_per_day - width + 1)) - 1
+    mask = 0
+    for d in range(day_count):
+        mask |= day_bits << (d * slots_per_day)
+    return mask
+
+def _all_of(bits: int, width: int) -> int:
+    """Bit i set when bits i .. i+width-1 are all set."""
+    result = bits
+    for shift in range(1, width):
+        result &= bits >> shift
+    return result
+
+def _any_of(bits: int, width: int) -> int:
+    """Bit i set when any of bits i .. i+width-1 is set."""
+    result = bits
+    for shift in range(1, width):
+        result |= bits >> shift
+    return result
+
+def _add_to_counter(planes: List[int], bits: int):
+    """Bit-sliced add: planes[k] holds bit k of every position's count."""
+    carry = bits
+    for i, plane in enumerate(planes):
+        if not carry:
+            return
+        planes[i] = plane ^ carry
+        carry = plane & carry
+    if carry:
+        planes.append(carry)
+
+def _count_at(planes: List[int], pos: int) -> int:
+    return sum(((plane >> pos) & 1) << k for k, plane in enumerate(planes))
+
+
+# --- Search ---
+def find_windows(data: Dict, duration_minutes: int, min_players: int, limit: int = 10) -> List[Dict]:
+    """
+    Rank candidate scrim windows from an availability matrix (see
+    db.get_availability_matrix).
+
+    A player counts towards a window when every slot it covers is marked
+    available. Slot minutes can run past midnight (the closing "12AM" is
+    1440), so start_date/end_date give the day each clock time falls on. Windows are ranked by available players, then by fewest
+    players marked unavailable, then earliest start.
+    """
+    days = data["days"]
+    slots = data["slots"]
+    slot_minutes = data["slot_minutes"]
+    statuses = data["statuses"]
+    players = data["players"]
+    slots_per_day = len(slots)
+
+    width = max(1, math.ceil(duration_minutes / SLOT_LENGTH_MINUTES))
+    mask = _start_mask(len(days), slots_per_day, width)
+    if not mask or not players:
+        return []
+
+    available = _player_bitsets(data["matrix"], statuses.index("available"))
+    unavailable = _player_bitsets(data["matrix"], statuses.index("unavailable"))
+
+    fits = [_all_of(bits, width) & mask for bits in available]
+    blocked = [_any_of(bits, width) & mask for bits in unavailable]
+
+    fit_counts = []
+    blocked_counts = []
+    for bits in fits:
+        _add_to_counter(fit_counts, bits)
+    for bits in blocked:
+        _add_to_counter(blocked_counts, bits)
+
+    candidates = []
+    union = 0
+    for bits in fits:
+        union |= bits
+    while union:
+        low = union & -union
+        pos = low.bit_length() - 1
+        union ^= low
+        count = _count_at(fit_counts, pos)
+        if count >= min_players:
+            candidates.append((-count, _count_at(blocked_counts, pos), pos))
+
+    candidates.sort()
+    results = []
+    for neg_count, blocked_count, pos in candidates[:limit]:
+        day, slot = divmod(pos, slots_per_day)
+        start = slot_minutes[slot]
+        end = start + duration_minutes
+        start_date, start_time = _day_and_clock(days[day], start)
+        end_date, end_time = _day_and_clock(days[day], end)
+        results.append({
+            "date": days[day],
+            "day_label": data["day_labels"][day],
+            "slot": slots[slot],
+            "start_date": start_date,
+            "start_time": start_time,
+            "end_date": end_date,
+            "end_time": end_time,
+            "available": -neg_count,
+            "unavailable": blocked_count,
+            "total_players": len(players),
+            "available_players": [p["name"] for p, bits in zip(players, fits) if (bits >> pos) & 1],
+        })
+    return results
+
+def _day_and_clock(day: str, minutes: int):
+    """(ISO date, "HH:MM") of `minutes` from midnight of `day`, which may be a later day."""
+    days, minutes = divmod(minutes, 1440)
+    hour, minute = divmod(minutes, 60)
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat(), f"{hour:02d}:{minute:02d}"
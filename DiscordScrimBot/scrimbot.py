@@ -1,218 +1,1059 @@
 import discord
 from dotenv import load_dotenv
 import os
-import aiosqlite
+import asyncio
+import hashlib
+import json
 import pytz
 import calendar
-from db import init_db, get_config, set_config
-from datetime import datetime
-from discord.ext import tasks
+from db import (
+    init_db, open_db, close_db, get_config, set_config,
+    get_data_version, fetch_scrim_events, ack_scrim_events, get_upcoming_scrims,
+    archive_ended_scrims as db_archive_ended_scrims, ARCHIVE_BATCH_SIZE, record_reminder, forget_reminders,
+    get_reminder_ledger, set_user_timezone, get_user_timezone, get_version, get_players, get_availability,
+    get_attendance, save_attendance, get_scrim, get_teams, save_team, get_team_versions, check_caches,
+    AVAILABILITY_SLOTS, DAY_LABEL_FORMAT, ATTENDING, NOT_ATTENDING, DEFAULT_TEAM_ID, GLOBAL_CONFIG_TEAM,
+)
+from scheduler import DeadlineScheduler
+from outbound import OutboundQueue, PRIORITY_REMINDER, PRIORITY_BOARD
+from metrics import Counter, Gauge, Histogram, monitor_event_loop, serve as serve_metrics, watch_discord_rate_limits
+from tz import DEFAULT_TIMEZONE, get_zone, zone_names
+from search_index import PrefixIndex
+from recurrence import is_occurrence, split_occurrence_id
+from datetime import datetime, timedelta
 
 load_dotenv()
 
-DB = os.getenv("DB_PATH")
-TEST_GUILD_ID = int(os.getenv("TEST_GUILD_ID"))
-SCRIMS_CHANNEL_ID = int(os.getenv("SCRIMS_CHANNEL_ID"))
+# Commands are registered globally unless COMMAND_GUILD_IDS (or
+# TEST_GUILD_ID, for development) names the guilds to register them in
+COMMAND_GUILD_IDS = [
+    int(guild_id) for guild_id in os.getenv("COMMAND_GUILD_IDS", os.getenv("TEST_GUILD_ID", "")).split(",")
+    if guild_id.strip()
+] or None
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-bot = discord.Bot(intents=intents)
+# Commands are synced from on_ready only when they have changed (see
+# sync_commands_if_changed), not on every gateway connect
+bot = discord.Bot(intents=intents, auto_sync_commands=False)
 
-# --- Get or create the permanent scrims board message ---
-async def get_or_create_scrims_board(channel):
-    scrims_message_id = await get_config("scrims_message_id")
-    scrims_msg = None
+# Every Discord write goes through here (reminders > board edits > cleanup)
+outbound = OutboundQueue(workers=int(os.getenv("DISCORD_WORKERS", "3")))
 
-    if scrims_message_id:
-        try:
-            scrims_msg = await channel.fetch_message(int(scrims_message_id))
-        except:
-            scrims_msg = None
-
-    if not scrims_msg:
-        embed = discord.Embed(
-            title="Upcoming Scrims",
-            description="No scrims yet",
-            color=discord.Color.green()
-        )
-        scrims_msg = await channel.send(embed=embed)
-        await set_config("scrims_message_id", str(scrims_msg.id))
+# --- Metrics ---
+BOARD_UPDATES = Histogram("scrim_board_update_seconds", "Time to re-render and sync the scrims board.")
+BOARD_EDITS = Counter(
+    "scrim_board_messages_total", "Board message writes: edited, refetched, reposted, posted or deleted.", ("result",)
+)
+REMINDER_LATENESS = Histogram(
+    "reminder_lateness_seconds", "Reminder message sent time minus its intended deadline.", ("minutes",),
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120),
+)
+SCRIM_EVENTS_APPLIED = Counter("scrim_events_applied_total", "Change feed events applied by the bot.")
+Gauge("discord_outbound_backlog", "Outbound Discord jobs waiting for a worker.", func=lambda: outbound.backlog)
+Gauge("discord_gateway_latency_seconds", "Heartbeat latency of the gateway connection.", func=lambda: bot.latency)
+Gauge("discord_bot_ready", "1 once the bot has connected and finished on_ready.", func=lambda: int(bot.is_ready()))
+Gauge("scrim_team_count", "Teams (guilds) the bot keeps a board for.", func=lambda: len(teams))
 
-    return scrims_msg
+# --- Teams ---
+# Each guild is a team with its own board channel, schedule and roster.
+# The teams table is cached here and reloaded when its version moves.
+teams = {}        # team_id -> {"id", "name", "guild_id", "channel_id"}
+guild_teams = {}  # guild_id -> team_id
+team_state = {"version": None}
 
-# --- Updates the embed with scrim data ---
-async def update_scrims_embed(msg):
-    now = datetime.now(pytz.utc)
-    async with aiosqlite.connect(DB) as db:
-        cursor = await db.execute(
-            """SELECT name, start_time_utc, end_time_utc, contact, note 
-               FROM scrims 
-               WHERE end_time_utc > ? 
-               ORDER BY start_time_utc ASC""",
-            (now.isoformat(),)
-        )
-        scrims = await cursor.fetchall()
+async def load_teams(force: bool = False):
+    """Reload the teams cache if it changed; a team moved to another channel gets a fresh board."""
+    version = await get_version("teams")
+    if not force and version == team_state["version"]:
+        return
+    rows = await get_teams()
+    for team in rows:
+        previous = teams.get(team["id"])
+        board = boards.get(team["id"])
+        if previous and previous["channel_id"] != team["channel_id"] and board and board["messages"]:
+            for msg in board["messages"]:
+                outbound.delete(msg, team=team["id"])
+            board["messages"], board["hashes"], board["weeks"] = [], [], []
+    teams.clear()
+    teams.update((team["id"], team) for team in rows)
+    guild_teams.clear()
+    guild_teams.update((team["guild_id"], team["id"]) for team in rows if team["guild_id"])
+    team_state["version"] = version
+
+def team_channel(team_id: int):
+    team = teams.get(team_id)
+    return bot.get_channel(team["channel_id"]) if team and team["channel_id"] else None
+
+# --- Board message state ---
+# The board is a list of messages, one embed each, edited through partial
+# messages (no fetch). Each message remembers the week page it shows and a
+# hash of its render, so only pages whose content changed are edited and a
+# week dropping off the top deletes its message without moving the rest.
+BOARD_DEBOUNCE_SECONDS = 1.0
+
+# Discord rejects embeds over 25 fields or 6000 characters in total
+EMBED_MAX_FIELDS = 25
+EMBED_MAX_CHARS = 5500
+SPACER_FIELD = ("\u200b", "\u200b")
+
+# Two RSVP buttons per scrim, two scrims per row, five rows per message
+RSVP_SCRIMS_PER_ROW = 2
+BOARD_MAX_SCRIMS = 5 * RSVP_SCRIMS_PER_ROW
+
+boards = {}  # team_id -> {"messages", "hashes", "weeks", "dirty", "task"}
+
+def board_for(team_id: int):
+    board = boards.get(team_id)
+    if board is None:
+        board = boards[team_id] = {"messages": None, "hashes": [], "weeks": [], "dirty": False, "task": None}
+    return board
+
+async def load_board_messages(channel, team_id: int = DEFAULT_TEAM_ID):
+    """Partial message handles for the team's stored board pages."""
+    stored = await get_config("scrims_message_ids", team_id)
+    if stored:
+        ids = json.loads(stored)
+    else:
+        # Boards created before pagination only stored the one message
+        first = await get_config("scrims_message_id", team_id)
+        ids = [int(first)] if first else []
+
+    board = board_for(team_id)
+    board["messages"] = [channel.get_partial_message(int(i)) for i in ids]
+    # Unknown until the first redraw, which edits every page once
+    board["hashes"] = [None] * len(ids)
+    board["weeks"] = [None] * len(ids)
+
+async def save_board_messages(team_id: int = DEFAULT_TEAM_ID):
+    ids = [msg.id for msg in board_for(team_id)["messages"]]
+    await set_config("scrims_message_ids", json.dumps(ids), team_id)
+    if ids:
+        await set_config("scrims_message_id", str(ids[0]), team_id)
+
+# --- Builds the board pages from scrim data ---
+def scrim_field(name, start_dt, end_dt, contact, note, rsvp=None):
+    start_ts = int(start_dt.timestamp())
+    end_ts = int(end_dt.timestamp())
+    value_lines = [f"🕒 <t:{start_ts}:t> → <t:{end_ts}:t>"]
+    if contact:
+        value_lines.append(f"👤 **Contact:** {contact}")
+    if note:
+        value_lines.append(f"📝 **Note:** {note}")
+    if rsvp and any(rsvp):
+        value_lines.append(f"🙋 **{rsvp[ATTENDING]}** attending · **{rsvp[NOT_ATTENDING]}** out")
+    return (f"**{name.upper()}**", "\n".join(value_lines))
+
+def day_header(date_key, continued: bool = False):
+    weekday = calendar.day_name[date_key.weekday()]
+    suffix = " (cont.)" if continued else ""
+    return (f"📅 **{weekday.upper()} {date_key.strftime('%d/%m')}**{suffix}", "━━━━━━━━━━━━━━━━")
+
+def paginate_board(scrims_by_date):
+    """
+    Split the schedule into pages of (name, value) fields, returning
+    (key, fields, scrims) per page where scrims are the (id, name) pairs
+    that need RSVP buttons and key is (ISO year, week, part).
+
+    Each ISO week starts a new page so that a change only disturbs its own
+    week; a week that outgrows the embed or button limits continues on
+    extra pages (part 1, 2, ...).
+    """
+    pages = []
+
+    def new_page(week):
+        part = sum(page["week"] == week for page in pages)
+        page = {"week": week, "part": part, "fields": [], "chars": 0, "scrims": []}
+        pages.append(page)
+        return page
+
+    def fits(page, fields):
+        return (len(page["fields"]) + len(fields) <= EMBED_MAX_FIELDS
+                and len(page["scrims"]) < BOARD_MAX_SCRIMS
+                and page["chars"] + sum(len(n) + len(v) for n, v in fields) <= EMBED_MAX_CHARS)
 
-    embed = discord.Embed(title="⚔️  SCRIM SCHEDULE  ⚔️", color=discord.Color.green())
-    embed.description = "\u200b"
+    for date_key in sorted(scrims_by_date):
+        week = date_key.isocalendar()[:2]
+        page = pages[-1] if pages and pages[-1]["week"] == week else new_page(week)
 
+        for i, (scrim, field) in enumerate(scrims_by_date[date_key]):
+            lead = []
+            if i == 0:
+                lead = ([SPACER_FIELD] if page["fields"] else []) + [day_header(date_key)]
+            if not fits(page, lead + [field]):
+                page = new_page(week)
+                lead = [day_header(date_key, continued=i > 0)]
+            for name, value in lead + [field]:
+                page["fields"].append((name, value))
+                page["chars"] += len(name) + len(value)
+            page["scrims"].append(scrim)
+
+    return [(page["week"] + (page["part"],), page["fields"], page["scrims"]) for page in pages]
+
+def rsvp_view(scrims):
+    """Attending / not attending buttons for each (scrim_id, name) on a page."""
+    view = discord.ui.View(timeout=None)
+    for i, (scrim_id, name) in enumerate(scrims):
+        row = i // RSVP_SCRIMS_PER_ROW
+        short = name if len(name) <= 24 else name[:23] + "…"
+        view.add_item(discord.ui.Button(
+            label=f"✅ {short}", style=discord.ButtonStyle.success, custom_id=f"rsvp:{scrim_id}:yes", row=row
+        ))
+        view.add_item(discord.ui.Button(
+            label=f"❌ {short}", style=discord.ButtonStyle.secondary, custom_id=f"rsvp:{scrim_id}:no", row=row
+        ))
+    return view
+
+async def render_board_pages(team_id: int = DEFAULT_TEAM_ID):
+    """(key, embed, view) for each page of the team's board; see paginate_board for the key."""
+    now = datetime.now(pytz.utc)
+    scrims = await get_upcoming_scrims(now.isoformat(), team_id=team_id)
+
+    title = "⚔️  SCRIM SCHEDULE  ⚔️"
     if not scrims:
-        embed.description = "No scrims scheduled"
-        await msg.edit(embed=embed)
-        return
+        return [(None, discord.Embed(title=title, description="No scrims scheduled", color=discord.Color.green()), None)]
 
     scrims_by_date = {}
-    for name, start, end, contact, note in scrims:
+    for scrim_id, name, start, end, contact, note, _ in scrims:
         start_dt = datetime.fromisoformat(start).replace(tzinfo=pytz.utc)
-        date_key = start_dt.date()
-        if date_key not in scrims_by_date:
-            scrims_by_date[date_key] = []
-        scrims_by_date[date_key].append((name, start_dt, end, contact, note))
-
-    first_date = True
-
-    for date_key in sorted(scrims_by_date.keys()):
-        if not first_date:
-            embed.add_field(name="\u200b", value="\u200b", inline=False)
-        first_date = False
-
-        weekday = calendar.day_name[date_key.weekday()]
-        embed.add_field(
-            name=f"📅 **{weekday.upper()} {date_key.strftime('%d/%m')}**",
-            value="━━━━━━━━━━━━━━━━",
-            inline=False
+        end_dt = datetime.fromisoformat(end).replace(tzinfo=pytz.utc)
+        scrims_by_date.setdefault(start_dt.date(), []).append(
+            ((scrim_id, name), scrim_field(name, start_dt, end_dt, contact, note, rsvp_counts.get(scrim_id)))
+        )
+
+    pages = []
+    for i, (key, fields, page_scrims) in enumerate(paginate_board(scrims_by_date)):
+        embed = discord.Embed(title=title if i == 0 else None, color=discord.Color.green())
+        embed.description = "\u200b"
+        for name, value in fields:
+            embed.add_field(name=name, value=value, inline=False)
+        pages.append((key, embed, rsvp_view(page_scrims)))
+    return pages
+
+def match_board_pages(old_keys, keys):
+    """
+    Which posted message each new page goes in: an index into `old_keys`,
+    or None to post a new one. Reused messages keep their channel order and
+    new ones are posted after them, so the board still reads top to bottom.
+    Within that, as many pages as possible keep the message that already
+    shows their key, so a week coming or going leaves the others alone.
+    """
+    reuse = min(len(old_keys), len(keys))
+    # best[i][j]: most pages left in their own message when the first i
+    # pages go in i of the first j messages (-1: not possible)
+    best = [[0] * (len(old_keys) + 1)] + [[-1] * (len(old_keys) + 1) for _ in range(reuse)]
+    for i in range(1, reuse + 1):
+        for j in range(i, len(old_keys) + 1):
+            best[i][j] = max(best[i][j - 1], best[i - 1][j - 1] + (old_keys[j - 1] == keys[i - 1]))
+
+    plan = [None] * len(keys)
+    i, j = reuse, len(old_keys)
+    while i:
+        if best[i][j] == best[i][j - 1]:
+            j -= 1
+        else:
+            plan[i - 1] = j - 1
+            i, j = i - 1, j - 1
+    return plan
+
+def page_hash(embed, view):
+    payload = json.dumps(
+        [embed.to_dict(), view.to_components() if view else []], sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+async def edit_board_page(channel, msg, embed, view=None):
+    """Edit one page; fetch it (or post a replacement) only if the edit fails."""
+    try:
+        await msg.edit(embed=embed, view=view)
+        BOARD_EDITS.inc(result="edited")
+        return msg
+    except discord.HTTPException as e:
+        print(f"Board edit failed ({e}), fetching board message {msg.id}")
+    try:
+        msg = await channel.fetch_message(msg.id)
+        await msg.edit(embed=embed, view=view)
+        BOARD_EDITS.inc(result="refetched")
+        return msg
+    except discord.HTTPException:
+        BOARD_EDITS.inc(result="reposted")
+        return await channel.send(embed=embed, view=view)
+
+async def update_scrims_board(team_id: int = DEFAULT_TEAM_ID):
+    """Re-render a team's board and edit only the pages whose embed changed."""
+    with BOARD_UPDATES.time():
+        await _sync_board(team_id)
+
+async def _sync_board(team_id: int):
+    channel = team_channel(team_id)
+    if not channel:
+        print(f"Channel for team {team_id} not found!")
+        return
+
+    board = board_for(team_id)
+    if board["messages"] is None:
+        await load_board_messages(channel, team_id)
+    old_messages, old_hashes = board["messages"], board["hashes"]
+    ids_before = [msg.id for msg in old_messages]
+
+    pages = await render_board_pages(team_id)
+    keys = [key for key, _, _ in pages]
+    digests = [page_hash(embed, view) for _, embed, view in pages]
+    plan = match_board_pages(board["weeks"], keys)
+    messages = [None if index is None else old_messages[index] for index in plan]
+
+    # Changed pages are edited concurrently; a newer edit of the same
+    # message supersedes one that is still queued
+    edits = {
+        i: outbound.submit(
+            PRIORITY_BOARD,
+            lambda msg=messages[i], page=pages[i]: edit_board_page(channel, msg, *page[1:]),
+            key=("edit", messages[i].id),
+            team=team_id,
         )
+        for i, index in enumerate(plan)
+        if index is not None and old_hashes[index] != digests[i]
+    }
+    for i, msg in zip(edits, await asyncio.gather(*edits.values())):
+        messages[i] = msg
 
-        for name, start_dt, end, contact, note in scrims_by_date[date_key]:
-            end_dt = datetime.fromisoformat(end).replace(tzinfo=pytz.utc)
-            start_ts = int(start_dt.timestamp())
-            end_ts = int(end_dt.timestamp())
-            value_lines = [f"🕒 <t:{start_ts}:t> → <t:{end_ts}:t>"]
-            if contact:
-                value_lines.append(f"👤 **Contact:** {contact}")
-            if note:
-                value_lines.append(f"📝 **Note:** {note}")
-
-            embed.add_field(
-                name=f"**{name.upper()}**",
-                value="\n".join(value_lines),
-                inline=False
+    # New pages are posted in order, after every kept message
+    for i, index in enumerate(plan):
+        if index is None:
+            messages[i] = await outbound.submit(
+                PRIORITY_BOARD, lambda embed=pages[i][1], view=pages[i][2]: channel.send(embed=embed, view=view),
+                team=team_id,
             )
+            BOARD_EDITS.inc(result="posted")
+
+    # Pages no longer shown (a week that has passed) are deleted
+    for index in set(range(len(old_messages))) - set(plan):
+        outbound.delete(old_messages[index], team=team_id)
+        BOARD_EDITS.inc(result="deleted")
+
+    board["messages"], board["hashes"], board["weeks"] = messages, digests, keys
+    if [msg.id for msg in messages] != ids_before:
+        await save_board_messages(team_id)
+
+async def _flush_board_refresh(team_id: int):
+    board = board_for(team_id)
+    await asyncio.sleep(BOARD_DEBOUNCE_SECONDS)
+    while board["dirty"]:
+        board["dirty"] = False
+        try:
+            await update_scrims_board(team_id)
+        except Exception as e:
+            print(f"Failed to update scrims board of team {team_id}: {e}")
+
+# --- Exposed functions for main.py to call ---
+async def refresh_scrims(team_id: int = DEFAULT_TEAM_ID):
+    """Request a redraw of a team's board; a burst of requests becomes one trailing edit."""
+    board = board_for(team_id)
+    board["dirty"] = True
+    if board["task"] is None or board["task"].done():
+        board["task"] = asyncio.create_task(_flush_board_refresh(team_id))
+
+async def scrim_changed(scrim_id: int, team_id: int = DEFAULT_TEAM_ID):
+    """Reschedule one scrim's reminders after an add/edit/delete, then redraw its team's board."""
+    if not bot.is_ready():
+        return
+    await schedule_scrim(scrim_id)
+    await refresh_scrims(team_id)
+
+async def series_changed(series_id: int, team_id: int = DEFAULT_TEAM_ID):
+    """Reschedule every occurrence of a series that was added or deleted, then redraw."""
+    if not bot.is_ready():
+        return
+    await schedule_series(series_id)
+    await refresh_scrims(team_id)
+
+async def scrims_imported(first_id: int, team_id: int = DEFAULT_TEAM_ID):
+    """Schedule a bulk import (ids from `first_id` on) with one read, then redraw once."""
+    if not bot.is_ready():
+        return
+    for row in await get_upcoming_scrims(datetime.now(pytz.utc).isoformat(), team_id=team_id):
+        if row[0] >= first_id and row[0] not in scheduled_starts:
+            await apply_scrim_row(row[0], row)
+    await refresh_scrims(team_id)
+
+# ------------------------ COMMAND SYNC ------------------------ #
+
+COMMAND_HASH_KEY = "command_hash"
+# to_dict() builds these from sets, so their order changes from run to run
+UNORDERED_COMMAND_FIELDS = ("contexts", "integration_types")
 
-    await msg.edit(embed=embed, view=None)
+def _canonical(definition):
+    if isinstance(definition, dict):
+        return {
+            key: sorted(value) if key in UNORDERED_COMMAND_FIELDS and isinstance(value, list) else _canonical(value)
+            for key, value in definition.items()
+        }
+    if isinstance(definition, list):
+        return [_canonical(item) for item in definition]
+    return definition
 
-# --- Exposed function for main.py to call ---
-async def refresh_scrims():
-    """Fetch scrims board message and update embed immediately."""
-    channel = bot.get_channel(SCRIMS_CHANNEL_ID)
-    if channel:
-        scrims_msg = await get_or_create_scrims_board(channel)
-        await update_scrims_embed(scrims_msg)
+def command_hash() -> str:
+    """Digest of the command definitions as they are sent to Discord, and where they register."""
+    definitions = [_canonical(command.to_dict()) for command in bot.pending_application_commands]
+    payload = json.dumps([definitions, COMMAND_GUILD_IDS], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+async def sync_commands_if_changed():
+    """
+    Register the slash commands with Discord only when they differ from the
+    last sync. Unsynced commands are still dispatched: py-cord falls back
+    to matching interactions by command name.
+    """
+    digest = command_hash()
+    if await get_config(COMMAND_HASH_KEY, GLOBAL_CONFIG_TEAM) == digest:
+        print("Slash commands unchanged, skipping sync")
+        return
+    await bot.sync_commands()
+    await set_config(COMMAND_HASH_KEY, digest, GLOBAL_CONFIG_TEAM)
+    print("Synced slash commands")
 
 # ------------------------ BOT EVENT ------------------------ #
 
+_loaded = False  # on_ready has built the in-memory state once
+
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user}")
-    channel = bot.get_channel(SCRIMS_CHANNEL_ID)
-    await bot.sync_commands()
+    outbound.start()
+    await sync_commands_if_changed()
 
-    scrims_msg = await get_or_create_scrims_board(channel)
-    await update_scrims_embed(scrims_msg)
+    global _loaded
+    if _loaded:
+        # A reconnect: the schedule, indexes, RSVPs and boards in memory are
+        # still current, and changes made meanwhile wait in the change feed
+        wake_change_feed()
+        return
+    _loaded = True
 
-    if not reminder_loop.is_running():
-        reminder_loop.start()
+    await load_teams(force=True)
+    await load_rsvps()
+    # Boards reload their messages and redraw through the debounced path,
+    # so hundreds of teams share the outbound workers in turn
+    for team_id in teams:
+        board_for(team_id)["messages"] = None
+        await refresh_scrims(team_id)
 
-    try:
-        from main import set_bot_instance
-        set_bot_instance(bot)
-    except:
-        pass
+    await load_reminder_ledger()
+    await load_schedule()
+    reminder_scheduler.start()
+    await load_indexes()
+
+    global _change_feed_task, _archive_task
+    if _change_feed_task is None or _change_feed_task.done():
+        _change_feed_task = asyncio.create_task(consume_change_feed())
+    if _archive_task is None or _archive_task.done():
+        _archive_task = asyncio.create_task(archive_loop())
+
+# ------------------------ AUTOCOMPLETE INDEXES ------------------------ #
+
+# Autocomplete is answered from memory: these are rebuilt on_ready and kept
+# current by the change feed, so a keystroke never touches SQLite.
+scrim_indexes = {}            # team_id -> upcoming scrims by name and contact
+player_indexes = {}           # team_id -> players by name
+zone_index = PrefixIndex()    # IANA timezone names
+index_state = {"players_versions": {}}
 
-# ------------------------ TASKS ------------------------ #
+AUTOCOMPLETE_SECONDS = Histogram(
+    "discord_autocomplete_seconds", "Time to answer an autocomplete request.", ("option",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1),
+)
+AUTOCOMPLETE_LIMIT = 25  # Discord shows at most 25 choices
 
-sent_reminders = {}
+def scrim_label(name, start):
+    start_dt = datetime.fromisoformat(start).astimezone(get_zone(DEFAULT_TIMEZONE))
+    return f"{name} · {start_dt.strftime('%a %d/%m %H:%M %Z')}"[:100]
 
-@tasks.loop(minutes=1)
-async def reminder_loop():
+def team_index(indexes, team_id: int) -> PrefixIndex:
+    index = indexes.get(team_id)
+    if index is None:
+        index = indexes[team_id] = PrefixIndex()
+    return index
+
+def index_scrim(scrim_id, name, start, contact, team_id):
+    team_index(scrim_indexes, team_id).add(scrim_id, scrim_label(name, start), (name, contact), sort_key=start)
+
+def unindex_scrim(scrim_id):
+    """Drop a scrim from its team's index; returns the team it belonged to."""
+    team_id = scrim_teams.pop(scrim_id, None)
+    if team_id in scrim_indexes:
+        scrim_indexes[team_id].remove(scrim_id)
+    return team_id
+
+async def load_indexes():
     now = datetime.now(pytz.utc)
+    by_team = {}
+    for scrim_id, name, start, end, contact, note, team_id in await get_upcoming_scrims(now.isoformat()):
+        by_team.setdefault(team_id, []).append((scrim_id, scrim_label(name, start), (name, contact), start))
+    scrim_indexes.clear()
+    for team_id, items in by_team.items():
+        team_index(scrim_indexes, team_id).replace_all(items)
+    await sync_player_index(force=True)
+    if not len(zone_index):
+        zone_index.replace_all((name, name, (name.replace("/", " "),), name) for name in zone_names())
+    print(f"Indexed {sum(map(len, scrim_indexes.values()))} scrims and "
+          f"{sum(map(len, player_indexes.values()))} players for autocomplete")
 
-    async with aiosqlite.connect(DB) as db:
-        # Delete scrims that have ended
-        await db.execute("DELETE FROM scrims WHERE end_time_utc <= ?", (now.isoformat(),))
-        await db.commit()
+async def sync_player_index(force: bool = False):
+    """Rebuild the player index of each team whose players version has moved."""
+    versions = await get_team_versions("players")
+    known = index_state["players_versions"]
+    if any(versions.get(team_id, 0) != known.get(team_id) for team_id in teams):
+        await check_caches(force=True)  # the web process may have just written them
+    for team_id in teams:
+        version = versions.get(team_id, 0)
+        if force or version != known.get(team_id):
+            team_index(player_indexes, team_id).replace_all(
+                (p["id"], p["name"], (p["name"],), p["id"]) for p in await get_players(team_id)
+            )
+            known[team_id] = version
 
-        # Get remaining scrims for reminders
-        cursor = await db.execute("SELECT name, start_time_utc FROM scrims ORDER BY start_time_utc ASC")
-        scrims = await cursor.fetchall()
+def ctx_team(ctx):
+    """The team of the guild a command or autocomplete came from, or None."""
+    return guild_teams.get(ctx.interaction.guild_id)
 
-        channel = bot.get_channel(SCRIMS_CHANNEL_ID)
-        if not channel:
-            print("Channel not found!")
-            return
-        
-    scrims_msg = await get_or_create_scrims_board(channel)
-    await update_scrims_embed(scrims_msg)
+def autocomplete(get_index, option):
+    """Choices from the index `get_index(ctx)` picks, e.g. the caller's team's."""
+    async def complete(ctx: discord.AutocompleteContext):
+        with AUTOCOMPLETE_SECONDS.time(option=option):
+            index = get_index(ctx)
+            if index is None:
+                return []
+            return [
+                discord.OptionChoice(name=label[:100], value=str(item_id))
+                for item_id, label in index.search(ctx.value, AUTOCOMPLETE_LIMIT)
+            ]
+    return complete
+
+def resolve_choice(index, value):
+    """The item id for a picked choice, or the best match for free text."""
+    if value in index:
+        return value
+    # Series occurrences have negative ids
+    if value and value.lstrip("-").isdigit() and int(value) in index:
+        return int(value)
+    matches = index.search(value, 1)
+    return matches[0][0] if matches else None
+
+# ------------------------ COMMANDS ------------------------ #
+
+NO_TEAM_REPLY = "This server has no scrim board yet; a server manager can run `/setup`"
+
+@bot.slash_command(name="setup", description="Post this server's scrim board and reminders in a channel",
+                   guild_ids=COMMAND_GUILD_IDS)
+@discord.default_permissions(manage_guild=True)
+async def setup_command(
+    ctx: discord.ApplicationContext,
+    channel: discord.Option(discord.TextChannel, "Channel for the board and reminders"),
+    name: discord.Option(str, "Team name", required=False),
+):
+    if ctx.guild_id is None:
+        await ctx.respond("Run this in the server the board is for", ephemeral=True)
+        return
+    current = teams.get(guild_teams.get(ctx.guild_id))
+    name = name or (current["name"] if current else ctx.guild.name)
+    team_id = await save_team(name, ctx.guild_id, channel.id)
+    await load_teams(force=True)
+    await sync_player_index()
+    await refresh_scrims(team_id)
+    await ctx.respond(f"Scrims for **{name}** will be posted in {channel.mention}", ephemeral=True)
+
+@bot.slash_command(name="timezone", description="Set the timezone scrim times are shown to you in",
+                   guild_ids=COMMAND_GUILD_IDS)
+async def timezone_command(
+    ctx: discord.ApplicationContext,
+    zone: discord.Option(str, "e.g. Europe/London", autocomplete=autocomplete(lambda ctx: zone_index, "timezone"),
+                         required=False),
+):
+    if not zone:
+        current = await get_user_timezone(ctx.author.id) or DEFAULT_TIMEZONE
+        await ctx.respond(f"Your timezone is **{current}**", ephemeral=True)
+        return
+    try:
+        get_zone(zone)
+    except ValueError:
+        await ctx.respond(f"Unknown timezone `{zone}`, pick one from the list", ephemeral=True)
+        return
+    await set_user_timezone(ctx.author.id, zone)
+    await ctx.respond(f"Timezone set to **{zone}**", ephemeral=True)
 
-    for title, start in scrims:
+@bot.slash_command(name="scrims", description="List the next upcoming scrims", guild_ids=COMMAND_GUILD_IDS)
+async def scrims_command(
+    ctx: discord.ApplicationContext,
+    count: discord.Option(int, "How many to show", min_value=1, max_value=20, default=10),
+):
+    team_id = ctx_team(ctx)
+    if team_id is None:
+        await ctx.respond(NO_TEAM_REPLY, ephemeral=True)
+        return
+    rows = await get_upcoming_scrims(datetime.now(pytz.utc).isoformat(), limit=count, team_id=team_id)
+    embed = discord.Embed(title="⚔️  Upcoming scrims", color=discord.Color.green())
+    if not rows:
+        embed.description = "No scrims scheduled"
+    for scrim_id, name, start, end, contact, note, _ in rows:
         start_dt = datetime.fromisoformat(start).replace(tzinfo=pytz.utc)
-        diff = (start_dt - now).total_seconds() / 60
-
-        print(f"Checking scrim '{title}': {diff:.1f} minutes away")
-
-        # Delete all reminders when scrim starts (diff <= 0)
-        if diff <= 0:
-            print(f"Scrim '{title}' has started, deleting all reminders...")
-            keys_to_delete = [key for key in sent_reminders.keys() if key[0] == title]
-            for old_key in keys_to_delete:
-                try:
-                    await sent_reminders[old_key].delete()
-                    print(f"Deleted reminder: {old_key}")
-                except Exception as e:
-                    print(f"Failed to delete reminder {old_key}: {e}")
-                del sent_reminders[old_key]
+        end_dt = datetime.fromisoformat(end).replace(tzinfo=pytz.utc)
+        field_name, value = scrim_field(name, start_dt, end_dt, contact, note)
+        embed.add_field(name=field_name, value=f"<t:{int(start_dt.timestamp())}:D>\n{value}", inline=False)
+    await ctx.respond(embed=embed, ephemeral=True)
+
+scrim_group = bot.create_group("scrim", "Scrim details", guild_ids=COMMAND_GUILD_IDS)
+
+@scrim_group.command(name="info", description="Show one scrim")
+async def scrim_info_command(
+    ctx: discord.ApplicationContext,
+    name: discord.Option(str, "Scrim name or contact",
+                         autocomplete=autocomplete(lambda ctx: scrim_indexes.get(ctx_team(ctx)), "scrim")),
+):
+    team_id = ctx_team(ctx)
+    if team_id is None:
+        await ctx.respond(NO_TEAM_REPLY, ephemeral=True)
+        return
+    scrim_id = resolve_choice(team_index(scrim_indexes, team_id), name)
+    row = await get_scrim(scrim_id) if scrim_id is not None else None
+    if not row or row[6] != team_id:
+        await ctx.respond(f"No upcoming scrim matches `{name}`", ephemeral=True)
+        return
+
+    _, title, start, end, contact, note, _ = row
+    start_ts = int(datetime.fromisoformat(start).replace(tzinfo=pytz.utc).timestamp())
+    end_ts = int(datetime.fromisoformat(end).replace(tzinfo=pytz.utc).timestamp())
+    embed = discord.Embed(title=title, color=discord.Color.green())
+    embed.add_field(name="When", value=f"<t:{start_ts}:F> → <t:{end_ts}:t> (<t:{start_ts}:R>)", inline=False)
+    if contact:
+        embed.add_field(name="Contact", value=contact, inline=False)
+    if note:
+        embed.add_field(name="Note", value=note, inline=False)
+    counts = rsvp_counts.get(scrim_id)
+    if counts:
+        embed.add_field(name="RSVPs", value=f"{counts[ATTENDING]} attending · {counts[NOT_ATTENDING]} out", inline=False)
+    await ctx.respond(embed=embed, ephemeral=True)
+
+AVAILABILITY_ICONS = {"available": "✅", "unavailable": "❌"}
+
+@bot.slash_command(name="availability", description="Show a player's availability for a week",
+                   guild_ids=COMMAND_GUILD_IDS)
+async def availability_command(
+    ctx: discord.ApplicationContext,
+    player: discord.Option(str, "Player name",
+                           autocomplete=autocomplete(lambda ctx: player_indexes.get(ctx_team(ctx)), "player")),
+    week: discord.Option(int, "0 = this week, 1 = next week", min_value=-4, max_value=8, default=0),
+):
+    team_id = ctx_team(ctx)
+    if team_id is None:
+        await ctx.respond(NO_TEAM_REPLY, ephemeral=True)
+        return
+    player_index = team_index(player_indexes, team_id)
+    player_id = resolve_choice(player_index, player)
+    if player_id is None:
+        await ctx.respond(f"No player matches `{player}`", ephemeral=True)
+        return
+
+    today = datetime.now(get_zone(DEFAULT_TIMEZONE)).date()
+    monday = today - timedelta(days=today.weekday()) + timedelta(weeks=week)
+    schedule = await get_availability(player_id, monday, monday + timedelta(days=6))
+
+    lines = []
+    for i in range(7):
+        day = monday + timedelta(days=i)
+        cells = schedule.get(day.strftime(DAY_LABEL_FORMAT), {})
+        parts = []
+        for status in ("available", "unavailable"):
+            slots = [slot for slot in AVAILABILITY_SLOTS if cells.get(slot) == status]
+            if slots:
+                parts.append(f"{AVAILABILITY_ICONS[status]} {' '.join(slots)}")
+        lines.append(f"`{day.strftime('%a %d/%m')}` {'  '.join(parts) or '—'}")
+    embed = discord.Embed(
+        title=f"{player_index.label(player_id)}: week of {monday.strftime('%d/%m')}",
+        description="\n".join(lines),
+        color=discord.Color.green(),
+    )
+    await ctx.respond(embed=embed, ephemeral=True)
+
+# ------------------------ RSVP ------------------------ #
+
+# Clicks are answered at once and kept in memory; the attendance table is
+# written in one transaction per flush, followed by one board redraw.
+RSVP_FLUSH_SECONDS = float(os.getenv("RSVP_FLUSH_SECONDS", "5"))
+
+rsvps = {}          # scrim_id -> {user_id: status}, attendance plus unflushed clicks
+rsvp_counts = {}    # scrim_id -> [not attending, attending]
+pending_rsvps = {}  # (scrim_id, user_id) -> status waiting for the next flush
+_rsvp_flush_task = None
+
+RSVP_CLICKS = Counter("rsvp_clicks_total", "RSVP button clicks.", ("changed",))
+RSVP_FLUSHES = Histogram("rsvp_flush_rows", "RSVPs written per flush.", buckets=(1, 5, 10, 25, 50, 100, 250, 1000))
+
+def set_rsvp(scrim_id: int, user_id: int, status: int) -> bool:
+    """Record an answer in memory; False when it is the user's current answer."""
+    answers = rsvps.setdefault(scrim_id, {})
+    previous = answers.get(user_id)
+    if previous == status:
+        return False
+    counts = rsvp_counts.setdefault(scrim_id, [0, 0])
+    if previous is not None:
+        counts[previous] -= 1
+    counts[status] += 1
+    answers[user_id] = status
+    pending_rsvps[(scrim_id, user_id)] = status
+    return True
+
+def forget_rsvps(scrim_id: int):
+    rsvps.pop(scrim_id, None)
+    rsvp_counts.pop(scrim_id, None)
+
+async def load_rsvps():
+    rsvps.clear()
+    rsvp_counts.clear()
+    for scrim_id, user_id, status in await get_attendance(datetime.now(pytz.utc).isoformat()):
+        rsvps.setdefault(scrim_id, {})[user_id] = status
+        rsvp_counts.setdefault(scrim_id, [0, 0])[status] += 1
+
+async def flush_rsvps():
+    """Write every pending click in one transaction, then redraw the board once."""
+    if not pending_rsvps:
+        return
+    rows = [(scrim_id, user_id, status) for (scrim_id, user_id), status in pending_rsvps.items()]
+    pending_rsvps.clear()
+    try:
+        await save_attendance(rows)
+    except Exception as e:
+        print(f"Failed to save {len(rows)} RSVPs, retrying next flush: {e}")
+        for scrim_id, user_id, status in rows:
+            pending_rsvps.setdefault((scrim_id, user_id), status)
+        return
+    RSVP_FLUSHES.observe(len(rows))
+    for team_id in {scrim_teams.get(scrim_id) for scrim_id, _, _ in rows} - {None}:
+        await refresh_scrims(team_id)
+
+async def _rsvp_flush_loop():
+    await asyncio.sleep(RSVP_FLUSH_SECONDS)
+    await flush_rsvps()
+
+def schedule_rsvp_flush():
+    global _rsvp_flush_task
+    if _rsvp_flush_task is None or _rsvp_flush_task.done():
+        _rsvp_flush_task = asyncio.create_task(_rsvp_flush_loop())
+
+@bot.listen("on_interaction")
+async def on_rsvp_click(interaction: discord.Interaction):
+    custom_id = (interaction.data or {}).get("custom_id", "")
+    if interaction.type != discord.InteractionType.component or not custom_id.startswith("rsvp:"):
+        return
+    _, scrim_id, answer = custom_id.split(":")
+    scrim_id = int(scrim_id)
+    status = ATTENDING if answer == "yes" else NOT_ATTENDING
+
+    changed = set_rsvp(scrim_id, interaction.user.id, status)
+    RSVP_CLICKS.inc(changed=changed)
+    if changed:
+        schedule_rsvp_flush()
+
+    # Interaction replies have their own token and 3 second deadline, so
+    # they are sent directly instead of queueing behind channel writes
+    counts = rsvp_counts[scrim_id]
+    reply = "You're in" if status == ATTENDING else "Marked you as out"
+    await interaction.response.send_message(
+        f"{reply} ({counts[ATTENDING]} attending, {counts[NOT_ATTENDING]} out)", ephemeral=True
+    )
+
+# ------------------------ CHANGE FEED ------------------------ #
+
+# How often a bot running on its own (SCRIMBOT_MODE=external) checks PRAGMA
+# data_version for writes made by the web processes. Embedded, every writer
+# shares this process and wakes the feed, so an idle bot makes no queries.
+CHANGE_FEED_POLL_SECONDS = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "1"))
+
+_change_feed_wake = asyncio.Event()
+_change_feed_task = None
+_change_feed_poll = None  # seconds between checks; set by run_standalone
+
+def wake_change_feed():
+    _change_feed_wake.set()
+
+async def apply_scrim_events():
+    """Apply queued scrim changes, each scrim once per batch."""
+    while bot.is_ready():
+        events = await fetch_scrim_events()
+        if not events:
+            return
+        for kind, item_id, team_id in dict.fromkeys(
+                (kind if kind in ("series", "imported") else "scrim", item_id, team_id)
+                for _, kind, item_id, team_id in events):
+            if kind == "series":
+                await series_changed(item_id, team_id)
+            elif kind == "imported":
+                await scrims_imported(item_id, team_id)
+            else:
+                await scrim_changed(item_id, team_id)
+        await ack_scrim_events(events[-1][0])
+        SCRIM_EVENTS_APPLIED.inc(len(events))
+
+async def consume_change_feed():
+    last_version = None
+    while True:
+        try:
+            await asyncio.wait_for(_change_feed_wake.wait(), timeout=_change_feed_poll)
+        except asyncio.TimeoutError:
+            pass
+        woken = _change_feed_wake.is_set()
+        _change_feed_wake.clear()
+
+        try:
+            if _change_feed_poll is not None:
+                version = await get_data_version()
+                if not woken and version == last_version:
+                    continue
+                last_version = version
+            await load_teams()
+            await apply_scrim_events()
+            await sync_player_index()
+        except Exception as e:
+            print(f"Failed to apply scrim changes: {e}")
+
+# ------------------------ REMINDERS ------------------------ #
+
+REMINDER_MINUTES = (30, 15, 5)
+# A deadline that is at most this late (e.g. the loop was busy) still fires
+REMINDER_GRACE = timedelta(minutes=1)
+
+sent_reminders = {}    # (scrim_id, minutes) -> reminder message, mirrors the reminders table
+scheduled_starts = {}  # scrim_id -> start_time_utc the deadlines were built from
+scrim_teams = {}       # scrim_id -> team_id, for every scheduled scrim
+
+# Reminder sends run beside the scheduler, so a deadline never waits on
+# another team's Discord round trip
+_reminder_tasks = set()
+
+def _reminder_done(task):
+    _reminder_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"Reminder failed: {task.exception()}")
+
+async def handle_deadline(scrim_id, kind, fire_at):
+    if kind == "horizon":
+        await extend_series_horizon()
+    elif kind == "end":
+        # The row itself is left for the archiver
+        team_id = unindex_scrim(scrim_id)
+        scheduled_starts.pop(scrim_id, None)
+        forget_rsvps(scrim_id)
+        if team_id is not None:
+            await refresh_scrims(team_id)
+    elif kind == "start":
+        print(f"Scrim {scrim_id} has started, deleting all reminders...")
+        await delete_reminders(scrim_id)
+    else:
+        task = asyncio.create_task(send_reminder(scrim_id, int(kind), due=fire_at))
+        _reminder_tasks.add(task)
+        task.add_done_callback(_reminder_done)
+
+reminder_scheduler = DeadlineScheduler(handle_deadline)
+
+def schedule_deadlines(scrim_id: int, start: str, end: str):
+    """Queue the reminder, start and end deadlines for one scrim."""
+    now = datetime.now(pytz.utc)
+    start_dt = datetime.fromisoformat(start).replace(tzinfo=pytz.utc)
+    end_dt = datetime.fromisoformat(end).replace(tzinfo=pytz.utc)
+
+    reminder_scheduler.cancel(scrim_id)
+    scheduled_starts[scrim_id] = start
+
+    for minutes in REMINDER_MINUTES:
+        fire_at = start_dt - timedelta(minutes=minutes)
+        if (scrim_id, minutes) in sent_reminders or fire_at + REMINDER_GRACE < now:
             continue
+        reminder_scheduler.schedule(fire_at, scrim_id, str(minutes))
+    reminder_scheduler.schedule(start_dt, scrim_id, "start")
+    reminder_scheduler.schedule(end_dt, scrim_id, "end")
 
-        # Send reminders at 30, 15, and 5 minutes
-        for reminder_time in [30, 15, 5]:
-            key = (title, reminder_time)
-            
-            # Check if we're within 0.5 minutes of the reminder time
-            if abs(diff - reminder_time) < 0.5 and key not in sent_reminders:
-                print(f"Sending {reminder_time}min reminder for '{title}'")
-                msg = await channel.send(f"@everyone **{title}** starting in {int(round(diff))} minutes")
-                sent_reminders[key] = msg
-
-                # Delete previous reminders for this scrim (e.g., when 15min arrives, delete 30min)
-                keys_to_delete = [
-                    old_key for old_key in sent_reminders.keys() 
-                    if old_key[0] == title and old_key[1] > reminder_time
-                ]
-                
-                for old_key in keys_to_delete:
-                    try:
-                        await sent_reminders[old_key].delete()
-                        print(f"Deleted old reminder: {old_key}")
-                    except Exception as e:
-                        print(f"Failed to delete old reminder {old_key}: {e}")
-                    del sent_reminders[old_key]
+async def load_reminder_ledger():
+    """
+    Rebuild sent_reminders from the reminders table after a restart, and
+    delete reminder messages whose scrim has since started or been removed.
+    """
+    now = datetime.now(pytz.utc)
+    sent_reminders.clear()
+    stale = {}
+
+    # Runs before the schedule is loaded, so each row carries its own team
+    for scrim_id, minutes, channel_id, message_id, team_id, start in await get_reminder_ledger():
+        channel = bot.get_channel(channel_id)
+        if channel is None:
             continue
+        msg = channel.get_partial_message(message_id)
+        if start is None or datetime.fromisoformat(start).replace(tzinfo=pytz.utc) <= now:
+            stale.setdefault(scrim_id, []).append((minutes, msg, team_id))
+        else:
+            sent_reminders[(scrim_id, minutes)] = msg
+
+    for scrim_id, entries in stale.items():
+        for minutes, msg, team_id in entries:
+            outbound.delete(msg, team=team_id)
+        await forget_reminders(scrim_id)
+    print(f"Recovered {len(sent_reminders)} reminders, cleaned up {sum(map(len, stale.values()))}")
+
+async def load_schedule():
+    """Build the deadline heap from every scrim that has not ended."""
+    scrims = await get_upcoming_scrims(datetime.now(pytz.utc).isoformat())
+    for scrim_id, name, start, end, contact, note, team_id in scrims:
+        scrim_teams[scrim_id] = team_id
+        schedule_deadlines(scrim_id, start, end)
+    schedule_horizon()
+    print(f"Scheduled reminders for {len(scrims)} scrims")
+
+# Series occurrences are only scheduled SERIES_HORIZON_DAYS ahead, so the
+# window is rolled forward daily
+SERIES_HORIZON_INTERVAL = timedelta(days=1)
+
+def schedule_horizon():
+    reminder_scheduler.cancel("horizon")
+    reminder_scheduler.schedule(datetime.now(pytz.utc) + SERIES_HORIZON_INTERVAL, "horizon", "horizon")
+
+async def extend_series_horizon():
+    """Schedule and index occurrences that have come inside the horizon."""
+    touched = set()
+    for row in await get_upcoming_scrims(datetime.now(pytz.utc).isoformat()):
+        if is_occurrence(row[0]) and row[0] not in scheduled_starts:
+            await apply_scrim_row(row[0], row)
+            touched.add(row[6])
+    schedule_horizon()
+    for team_id in touched:
+        await refresh_scrims(team_id)
 
-        for reminder in [30, 15, 5]:
-            key = (title, reminder)
-            if abs(diff - reminder) < 0.5 and key not in sent_reminders:
-                msg = await channel.send(f"@everyone **{title}** starting in {int(round(diff))} minutes")
-                sent_reminders[key] = msg
+async def schedule_scrim(scrim_id: int):
+    """Re-read one scrim and rebuild only its deadlines and index entry."""
+    await apply_scrim_row(scrim_id, await get_scrim(scrim_id))
 
-                for old_key in list(sent_reminders.keys()):
-                    if old_key[0] == title and old_key != key:
-                        try:
-                            await sent_reminders[old_key].delete()
-                        except:
-                            pass
-                        del sent_reminders[old_key]
+async def schedule_series(series_id: int):
+    """Re-read a series' occurrences inside the horizon and resync their deadlines."""
+    rows = {
+        row[0]: row for row in await get_upcoming_scrims(datetime.now(pytz.utc).isoformat())
+        if is_occurrence(row[0]) and split_occurrence_id(row[0])[0] == series_id
+    }
+    known = [
+        scrim_id for scrim_id in scheduled_starts
+        if is_occurrence(scrim_id) and split_occurrence_id(scrim_id)[0] == series_id
+    ]
+    for scrim_id in dict.fromkeys(known + list(rows)):
+        await apply_scrim_row(scrim_id, rows.get(scrim_id))
+
+async def apply_scrim_row(scrim_id: int, row):
+    """Sync deadlines, index entry and RSVPs to a scrim row (None once it is gone)."""
+    if not row:
+        reminder_scheduler.cancel(scrim_id)
+        scheduled_starts.pop(scrim_id, None)
+        await delete_reminders(scrim_id)
+        unindex_scrim(scrim_id)
+        forget_rsvps(scrim_id)
+        return
+
+    _, name, start, end, contact, note, team_id = row
+    scrim_teams[scrim_id] = team_id
+    index_scrim(scrim_id, name, start, contact, team_id)
+    if scheduled_starts.get(scrim_id) not in (None, start):
+        # Start time moved, so reminders already posted are wrong
+        await delete_reminders(scrim_id)
+    schedule_deadlines(scrim_id, start, end)
+
+# ------------------------ HISTORY ------------------------ #
+
+# Ended scrims stay in the scrims table (hidden by end_time_utc) until this
+# loop moves them to scrim_history in batches, away from the deadline path.
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "300"))
+_archive_task = None
+
+async def archive_ended_scrims():
+    await flush_rsvps()  # so late clicks are counted in the history
+    now = datetime.now(pytz.utc).isoformat()
+    total = 0
+    while True:
+        archived = await db_archive_ended_scrims(now)
+        total += archived
+        if archived < ARCHIVE_BATCH_SIZE:
+            break
+        await asyncio.sleep(0)
+    if total:
+        print(f"Archived {total} ended scrims")
+    return total
+
+async def archive_loop():
+    while True:
+        try:
+            await archive_ended_scrims()
+        except Exception as e:
+            print(f"Failed to archive ended scrims: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+async def send_reminder(scrim_id: int, minutes: int, due: datetime = None):
+    row = await get_scrim(scrim_id)
+    if not row:
+        return
+
+    title, team_id = row[1], row[6]
+    channel = team_channel(team_id)
+    if not channel:
+        print(f"Channel for team {team_id} not found!")
+        return
+
+    print(f"Sending {minutes}min reminder for '{title}'")
+    msg = await outbound.submit(
+        PRIORITY_REMINDER,
+        lambda: channel.send(f"@everyone **{title}** starting in {minutes} minutes"),
+        team=team_id,
+    )
+    if due is not None:
+        REMINDER_LATENESS.observe((datetime.now(pytz.utc) - due).total_seconds(), minutes=minutes)
+
+    # Delete previous reminders for this scrim (e.g., when 15min arrives, delete 30min)
+    await delete_reminders(scrim_id)
+    sent_reminders[(scrim_id, minutes)] = msg
+    await record_reminder(scrim_id, minutes, channel.id, msg.id, team_id)
+
+async def delete_reminders(scrim_id: int):
+    deleted = []
+    for key in [(scrim_id, minutes) for minutes in REMINDER_MINUTES if (scrim_id, minutes) in sent_reminders]:
+        outbound.delete(sent_reminders.pop(key), team=scrim_teams.get(scrim_id))
+        deleted.append(key[1])
+    if deleted:
+        await forget_reminders(scrim_id, deleted)
 
 async def start_bot():
-    await bot.start(os.getenv("DISCORD_TOKEN"))
\ No newline at end of file
+    watch_discord_rate_limits()
+    await bot.start(os.getenv("DISCORD_TOKEN"))
+
+async def stop_bot():
+    """Disconnect, save pending RSVPs and stop the background loops; the caller closes the db."""
+    if not bot.is_closed():
+        await bot.close()
+    for task in (_change_feed_task, _archive_task, _rsvp_flush_task):
+        if task is not None:
+            task.cancel()
+    await flush_rsvps()
+    await reminder_scheduler.stop()
+    await outbound.stop()
+
+async def run_standalone():
+    """Bot-only process for SCRIMBOT_MODE=external."""
+    global _change_feed_poll
+    _change_feed_poll = CHANGE_FEED_POLL_SECONDS
+    await open_db()
+    await init_db()
+    asyncio.create_task(monitor_event_loop())
+    if os.getenv("METRICS_PORT"):
+        # Scrape target for this process; the web app serves its own /metrics
+        await serve_metrics(int(os.getenv("METRICS_PORT")))
+    try:
+        await start_bot()
+    finally:
+        await stop_bot()
+        await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(run_standalone())
\ No newline at end of file
@@ -0,0 +1,88 @@
+import bisect
+import heapq
+import re
+from typing import Hashable, Iterable, List, Tuple
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _normalise(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+class PrefixIndex:
+    """
+    In-memory prefix search for autocomplete.
+
+    Every word of an item's texts (and each whole text) is kept in one sorted
+    list of (token, item_id), so a lookup is a bisect to the first token with
+    the typed prefix and a scan of the matches. Items carry a sort key so
+    results come back in a useful order, e.g. soonest scrim first.
+    """
+
+    def __init__(self):
+        self._tokens: List[Tuple[str, Hashable]] = []
+        self._items = {}  # item_id -> (label, sort_key, tokens)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item_id):
+        return item_id in self._items
+
+    def _tokenise(self, texts: Iterable[str]):
+        tokens = set()
+        for text in texts:
+            if not text:
+                continue
+            normalised = _normalise(text)
+            if normalised:
+                tokens.add(normalised)
+                tokens.update(normalised.split())
+        return tokens
+
+    def add(self, item_id: Hashable, label: str, texts: Iterable[str], sort_key=0):
+        """Index (or re-index) an item under the words of `texts`."""
+        self.remove(item_id)
+        tokens = self._tokenise(texts)
+        for token in tokens:
+            bisect.insort(self._tokens, (token, item_id))
+        self._items[item_id] = (label, sort_key, tokens)
+
+    def remove(self, item_id: Hashable):
+        item = self._items.pop(item_id, None)
+        if item is None:
+            return
+        for token in item[2]:
+            i = bisect.bisect_left(self._tokens, (token, item_id))
+            if i < len(self._tokens) and self._tokens[i] == (token, item_id):
+                del self._tokens[i]
+
+    def replace_all(self, items: Iterable[Tuple[Hashable, str, Iterable[str], object]]):
+        """Rebuild from (item_id, label, texts, sort_key) with one sort."""
+        self._items = {}
+        pairs = []
+        for item_id, label, texts, sort_key in items:
+            tokens = self._tokenise(texts)
+            self._items[item_id] = (label, sort_key, tokens)
+            pairs.extend((token, item_id) for token in tokens)
+        pairs.sort()
+        self._tokens = pairs
+
+    def label(self, item_id: Hashable):
+        item = self._items.get(item_id)
+        return item[0] if item else None
+
+    def search(self, prefix: str, limit: int = 25) -> List[Tuple[Hashable, str]]:
+        """Up to `limit` (item_id, label) pairs whose words start with `prefix`."""
+        prefix = _normalise(prefix or "")
+        if not prefix:
+            ids = self._items.keys()
+        else:
+            ids = set()
+            i = bisect.bisect_left(self._tokens, (prefix,))
+            while i < len(self._tokens) and self._tokens[i][0].startswith(prefix):
+                ids.add(self._tokens[i][1])
+                i += 1
+        best = heapq.nsmallest(limit, ids, key=lambda item_id: self._items[item_id][1])
+        return [(item_id, self._items[item_id][0]) for item_id in best]
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DB_PATH = os.path.join(tempfile.mkdtemp(), "overlaps.db")
+os.environ["DB_PATH"] = DB_PATH
+sys.path.insert(0, str(ROOT))
+
+import db  # noqa: E402
+
+ARCHIVE_ELSEWHERE = """
+import asyncio, db
+from datetime import datetime, timezone
+async def main():
+    await db.open_db()
+    await db.archive_ended_scrims(datetime.now(timezone.utc).isoformat())
+    await db.close_db()
+asyncio.run(main())
+"""
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _fresh():
+    await db.close_db()
+    db._scrim_indexes.clear()
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    await db.open_db()
+    await db.init_db()
+
+
+def test_archive_in_another_process_rebuilds_index():
+    async def scenario():
+        await _fresh()
+        start = datetime.now(timezone.utc) - timedelta(days=2)
+        end = start + timedelta(hours=1)
+        await db.add_scrim("Ended", start.isoformat(), end.isoformat())
+        # Builds this process's index with the ended scrim in it
+        await db.add_scrim("Later", (end + timedelta(hours=1)).isoformat(),
+                           (end + timedelta(hours=2)).isoformat(), check_overlap=True)
+
+        subprocess.run([sys.executable, "-c", ARCHIVE_ELSEWHERE], cwd=ROOT,
+                       env=dict(os.environ, DB_PATH=DB_PATH), check=True)
+
+        # The archived scrim is no longer booked, so this overlap is allowed
+        scrim_id = await db.add_scrim("Same slot", start.isoformat(), end.isoformat(), check_overlap=True)
+        await db.close_db()
+        return scrim_id
+
+    assert run(scenario())
+
+
+def test_stale_index_never_fails_a_write():
+    async def scenario():
+        await _fresh()
+        start = datetime.now(timezone.utc) + timedelta(days=1)
+        end = start + timedelta(hours=1)
+        await db.add_scrim("Gone", start.isoformat(), end.isoformat(), check_overlap=True)
+        # Deleted behind the index's back, without a version bump
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("DELETE FROM scrims")
+        conn.commit()
+        conn.close()
+
+        scrim_id = await db.add_scrim("New", start.isoformat(), end.isoformat(), check_overlap=True)
+        await db.close_db()
+        return scrim_id
+
+    assert run(scenario())
+
+
+def test_overlap_still_refused():
+    async def scenario():
+        await _fresh()
+        start = datetime.now(timezone.utc) + timedelta(days=1)
+        await db.add_scrim("Booked", start.isoformat(), (start + timedelta(hours=1)).isoformat())
+        try:
+            await db.add_scrim("Clash", (start + timedelta(minutes=30)).isoformat(),
+                               (start + timedelta(hours=2)).isoformat(), check_overlap=True)
+        except db.OverlapError as e:
+            return [row[1] for row in e.conflicts]
+        finally:
+            await db.close_db()
+
+    assert run(scenario()) == ["Booked"]
@@ -0,0 +1,37 @@
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+os.environ.setdefault("SCRIMBOT_MODE", "external")
+sys.path[:0] = [str(ROOT), str(ROOT / "webapp")]
+# The app mounts static/ relative to the working directory
+os.chdir(ROOT)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+client = TestClient(main.app)
+
+
+def zone_for(cookie):
+    return client.get("/api/timezone", headers={"cookie": cookie}).json()["timezone"]
+
+
+def test_cookie_written_by_the_page():
+    # scrims.html writes the zone with encodeURIComponent
+    assert zone_for("tz=Europe%2FLondon") == "Europe/London"
+
+
+def test_cookie_written_by_the_server():
+    assert zone_for('tz="Europe/London"') == "Europe/London"
+
+
+def test_unknown_zone_falls_back_to_team_zone():
+    assert zone_for("tz=Not%2FAZone") == main.DEFAULT_TIMEZONE
+
+
+def test_non_numeric_user_id_is_refused():
+    response = client.post("/api/timezone", json={"timezone": "Europe/London", "user_id": "me"})
+    assert response.status_code == 400
@@ -0,0 +1,38 @@
+import os
+from datetime import date, datetime, time, timezone
+from functools import lru_cache
+from typing import Iterable, List
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+# Zone the team plans in: the availability grid and any request that does
+# not say which zone it is in
+DEFAULT_TIMEZONE = os.getenv("TEAM_TIMEZONE", "Australia/Melbourne")
+
+
+# --- Zone cache ---
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    """Cached zone lookup; raises ValueError for unknown names."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        raise ValueError(f"Unknown timezone: {name!r}")
+
+@lru_cache(maxsize=1)
+def zone_names() -> List[str]:
+    return sorted(available_timezones())
+
+
+# --- Conversions ---
+def local_to_utc(day: date, clock: time, zone: ZoneInfo) -> datetime:
+    """UTC instant of a wall-clock time on `day` in `zone`."""
+    return datetime.combine(day, clock, tzinfo=zone).astimezone(timezone.utc)
+
+def to_local(timestamps: Iterable[str], zone: ZoneInfo) -> List[datetime]:
+    """
+    Local datetimes for many stored UTC ISO timestamps in one pass:
+    fromisoformat and zoneinfo's astimezone both run in C, which measured
+    faster than caching offsets per quarter hour in Python.
+    """
+    parse = datetime.fromisoformat
+    return [parse(stamp).astimezone(zone) for stamp in timestamps]
@@ -0,0 +1,52 @@
+import asyncio
+import itertools
+import json
+
+
+class Broadcaster:
+    """
+    Fans small change events out to the browsers subscribed to a topic
+    (a team), so a write only costs the pages that show it.
+
+    Each subscriber gets a bounded queue. A client that falls too far behind
+    is sent a single "resync" event instead of an ever-growing backlog, and
+    reloads its data once.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers = {}  # topic -> set of queues
+        self._ids = itertools.count(1)
+
+    def subscribe(self, topic=None) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(topic, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, topic=None):
+        queues = self._subscribers.get(topic)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[topic]
+
+    @property
+    def subscriber_count(self):
+        return sum(map(len, self._subscribers.values()))
+
+    def publish(self, kind: str, data: dict, topic=None):
+        queues = self._subscribers.get(topic)
+        if not queues:
+            return
+        message = format_sse(kind, data, next(self._ids))
+        for queue in queues:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(format_sse("resync", {}, next(self._ids)))
+
+
+def format_sse(kind: str, data: dict, event_id: int) -> str:
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
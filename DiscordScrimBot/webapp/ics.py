@@ -0,0 +1,70 @@
+from datetime import datetime
+from typing import Iterable, Iterator
+
+# RFC 5545 lines end in CRLF and are folded at 75 octets
+LINE_LIMIT = 75
+PRODID = "-//ScrimBot//Scrim schedule//EN"
+# VEVENTs per chunk written to the response
+EVENTS_PER_CHUNK = 50
+
+
+def escape_text(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def fold(line: str) -> str:
+    """Fold a content line into 75-octet pieces, never splitting a UTF-8 character."""
+    data = line.encode()
+    if len(data) <= LINE_LIMIT:
+        return line + "\r\n"
+    parts, start, limit = [], 0, LINE_LIMIT
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode())
+        start, limit = end, LINE_LIMIT - 1  # continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+def utc_stamp(iso: str) -> str:
+    """20261017T080000Z for a UTC ISO time."""
+    return datetime.fromisoformat(iso).strftime("%Y%m%dT%H%M%SZ")
+
+def vevent(row, stamp: str, uid_domain: str) -> str:
+    scrim_id, name, start, end, contact, note = row[:6]
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:scrim{scrim_id}@{uid_domain}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{utc_stamp(start)}",
+        f"DTEND:{utc_stamp(end)}",
+        f"SUMMARY:{escape_text(name)}",
+    ]
+    details = [f"Contact: {contact}" if contact else None, note]
+    description = "\n".join(part for part in details if part)
+    if description:
+        lines.append(f"DESCRIPTION:{escape_text(description)}")
+    lines.append("END:VEVENT")
+    return "".join(fold(line) for line in lines)
+
+def calendar_chunks(rows: Iterable[tuple], name: str, stamp: str, uid_domain: str = "scrimbot") -> Iterator[str]:
+    """
+    A VCALENDAR of SCRIM_COLUMNS rows, yielded a few events at a time so
+    the response streams out as it is rendered. `stamp` is the DTSTAMP of
+    every event (the schedule's last change).
+    """
+    yield "".join(fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(name)}",
+    ))
+    chunk = []
+    for row in rows:
+        chunk.append(vevent(row, stamp, uid_domain))
+        if len(chunk) >= EVENTS_PER_CHUNK:
+            yield "".join(chunk)
+            chunk = []
+    yield "".join(chunk) + "END:VCALENDAR\r\n"
@@ -1,85 +1,360 @@
-from fastapi import FastAPI, Request, HTTPException, Body, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, FastAPI, Request, HTTPException, Body, Query
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-import pytz
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta, time, timezone
 from collections import defaultdict
 import os
+import io
+import csv
+import math
+import email.utils
 import asyncio
-import aiosqlite
+import time as clock
 from typing import Dict
-from scrimbot import start_bot
+from urllib.parse import unquote
+
+from scrim_finder import find_windows
+from broadcast import Broadcaster
+from ics import calendar_chunks, utc_stamp
+import metrics
+from tz import DEFAULT_TIMEZONE, get_zone, local_to_utc, to_local
+from db import (
+    init_db, open_db, close_db, get_players, update_player_name, update_player_names, add_players, remove_players,
+    set_availability, set_availability_many, get_availability as get_player_availability, get_availability_matrix,
+    get_all_availability as get_all_availability_db, get_version, get_upcoming_scrims,
+    add_scrim as add_scrim_db, update_scrim as update_scrim_db, delete_scrim as delete_scrim_db,
+    get_user_timezone, set_user_timezone, day_label_to_iso, add_series, get_series_list,
+    delete_series as delete_series_db, get_scrim_stats, get_teams, get_version_stamp, get_user_scrims,
+    add_scrims as add_scrims_db, OverlapError, AVAILABILITY_STATUSES, DEFAULT_TEAM_ID,
+)
+
+# "embedded": the bot runs on this event loop (single process).
+# "external": the bot runs on its own (python scrimbot.py) and picks up
+# changes from the scrim_events outbox, so the API can run with --workers N.
+BOT_MODE = os.getenv("SCRIMBOT_MODE", "embedded")
 
-from db import init_db, get_players, update_player_name, set_availability, get_availability
-
-from scrimbot import refresh_scrims  # <- Import the function
-
-DB = os.getenv("DB_PATH", "scrims.db")
 app = FastAPI()
-
-# Current player list (names only)
-player_names = ["Dfield", "Slidzorj", "Infima", "Chappadoodle", "Player 5", "Player 6"]
-
-# --- INTERNAL FUNCTION FOR PLAYER DATA ---
-def fetch_players():
-    """Return list of players with explicit IDs"""
-    return [{"id": i+1, "name": name} for i, name in enumerate(player_names)]
+# Team pages and APIs are served under /teams/{team_id}/...; the same
+# routes without the prefix are the first team's, so old links keep working
+router = APIRouter()
+bot_module = None  # scrimbot, imported only in embedded mode
+events = Broadcaster()
+EVENT_HEARTBEAT_SECONDS = 15
+
+# --- Request metrics ---
+REQUEST_SECONDS = metrics.Histogram(
+    "http_request_duration_seconds", "Time until the response headers were sent.", ("method", "route", "status")
+)
+metrics.Gauge("sse_subscribers", "Browsers connected to /api/events.", func=lambda: events.subscriber_count)
+
+class RequestTimer:
+    """
+    ASGI middleware timing each request up to its response start, labelled
+    by route template so /scrims?page=N is one series. Streams such as
+    /api/events count their time to first byte only.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = clock.perf_counter()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                REQUEST_SECONDS.observe(
+                    clock.perf_counter() - started,
+                    method=scope["method"],
+                    route=getattr(route, "path", "unmatched"),
+                    status=message["status"],
+                )
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+app.add_middleware(RequestTimer)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory=Path(__file__).parent / "templates")
 
-local_tz = pytz.timezone("Australia/Melbourne")
+# The availability grid is always in the team's zone; scrim times are shown
+# in the viewer's zone (see request_timezone)
+local_tz = get_zone(DEFAULT_TIMEZONE)
+TIMEZONE_COOKIE = "tz"
 DAYS = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
+MAX_MATRIX_DAYS = 62
+
+def week_monday(week_offset: int = 0):
+    """Local date of the Monday starting the week `week_offset` weeks from now."""
+    today = datetime.now(local_tz).date()
+    return today - timedelta(days=today.weekday()) + timedelta(weeks=week_offset)
 
 @app.on_event("startup")
 async def startup():
+    await open_db()
     await init_db()
-    # Start Discord bot in background
-    asyncio.create_task(start_bot())
-
-@app.get("/")
-@app.get("/scrims")
-async def scrims(request: Request):
-    scrims_by_day = await get_scrims_grouped()
+    await cached_teams()
+    asyncio.create_task(metrics.monitor_event_loop())
+    if BOT_MODE == "embedded":
+        asyncio.create_task(start_embedded_bot())
+
+async def start_embedded_bot():
+    """
+    Import and run the Discord bot beside the web app. discord is the
+    slowest import of the process, so it happens here, after startup has
+    returned, instead of holding up the first request.
+    """
+    global bot_module
+    import scrimbot
+    bot_module = scrimbot
+    await scrimbot.start_bot()
+
+def notify_bot():
+    """Wake an in-process bot; an external bot notices the outbox on its own."""
+    if bot_module is not None:
+        bot_module.wake_change_feed()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # The bot writes through the pool, so it stops first or it would reopen it
+    if bot_module is not None:
+        await bot_module.stop_bot()
+    await close_db()
+
+# --- Teams ---
+# Known team ids, reloaded when the teams version moves (a guild ran /setup)
+_teams_cache = {"version": None, "teams": []}
+
+async def cached_teams():
+    version = await get_version("teams")
+    if version != _teams_cache["version"]:
+        _teams_cache["teams"] = await get_teams()
+        _teams_cache["version"] = version
+    return _teams_cache["teams"]
+
+async def current_team(team_id: int = DEFAULT_TEAM_ID) -> int:
+    """The team a request is for: the {team_id} path segment, else the first team."""
+    # Teams are only ever added, so a known id needs no version check
+    if any(team["id"] == team_id for team in _teams_cache["teams"]):
+        return team_id
+    if not any(team["id"] == team_id for team in await cached_teams()):
+        raise HTTPException(status_code=404, detail="Team not found")
+    return team_id
+
+def team_base(request: Request) -> str:
+    """URL prefix the page was served under, for its links and fetches."""
+    team_id = request.path_params.get("team_id")
+    return f"/teams/{team_id}" if team_id is not None else ""
+
+@app.get("/api/teams")
+async def teams_api():
+    return {"teams": [
+        {"id": team["id"], "name": team["name"], "url": f"/teams/{team['id']}/scrims"}
+        for team in await cached_teams()
+    ]}
+
+SCRIMS_PAGE_DAYS = 14
+SCRIMS_VIEW_CACHE_MAX = 128
+
+# (scrims version, team, timezone, page, local date) -> (expires_at, grouped, has_more)
+_scrims_view_cache = {}
+
+def cookie_timezone(request: Request):
+    # Cookies set by the server arrive quoted because zone names contain "/";
+    # the page writes its own percent-encoded, and Starlette decodes neither
+    value = request.cookies.get(TIMEZONE_COOKIE)
+    return unquote(value.strip('"')) if value else None
+
+async def request_timezone(request: Request, tz: str = None, user_id: int = None) -> str:
+    """
+    Zone to show times in: an explicit ?tz=, then the user's saved zone,
+    then the browser's zone cookie, then the team's zone.
+    """
+    candidates = [tz]
+    if user_id is not None:
+        candidates.append(await get_user_timezone(user_id))
+    candidates += [cookie_timezone(request), DEFAULT_TIMEZONE]
+    for name in candidates:
+        if not name:
+            continue
+        try:
+            get_zone(name)
+            return name
+        except ValueError:
+            continue
+    return DEFAULT_TIMEZONE
+
+@router.get("/")
+@router.get("/scrims")
+async def scrims(
+    request: Request,
+    page: int = Query(0, ge=0),
+    tz: str = Query(None),
+    user_id: int = Query(None),
+    team_id: int = Depends(current_team),
+):
+    tz_name = await request_timezone(request, tz, user_id)
+    scrims_by_day, has_more = await get_scrims_grouped(page, tz_name, team_id)
+    # Local dates the page covers, so live updates know which scrims belong on it
+    first_day = datetime.now(get_zone(tz_name)).date() + timedelta(days=page * SCRIMS_PAGE_DAYS)
     return templates.TemplateResponse(
         "scrims.html",
-        {"request": request, "scrims_by_day": scrims_by_day}
+        {"request": request, "scrims_by_day": scrims_by_day, "page": page, "has_more": has_more,
+         "timezone": tz_name, "base": team_base(request), "first_day": first_day.isoformat(),
+         "end_day": (first_day + timedelta(days=SCRIMS_PAGE_DAYS)).isoformat()}
     )
 
-async def get_scrims_grouped():
-    async with aiosqlite.connect(DB) as db:
-        cursor = await db.execute("""
-            SELECT rowid, name, start_time_utc, end_time_utc, contact, note
-            FROM scrims
-            ORDER BY start_time_utc ASC
-        """)
-        rows = await cursor.fetchall()
-
-    grouped = defaultdict(list)
-
-    for row in rows:
-        start_dt = datetime.fromisoformat(row[2]).astimezone(local_tz)
-        end_dt = datetime.fromisoformat(row[3]).astimezone(local_tz)
-
-        day_key = start_dt.strftime("%A %d/%m/%Y")
-        grouped[day_key].append({
+@router.get("/api/scrims")
+async def scrims_api(
+    request: Request,
+    page: int = Query(0, ge=0),
+    tz: str = Query(None),
+    user_id: int = Query(None),
+    team_id: int = Depends(current_team),
+):
+    """One page of the schedule as the page's card views, for redrawing it in place."""
+    scrims_by_day, has_more = await get_scrims_grouped(page, await request_timezone(request, tz, user_id), team_id)
+    return {"scrims": [scrim for day in scrims_by_day.values() for scrim in day], "has_more": has_more}
+
+def scrim_views(rows, zone):
+    """Template views of (id, name, start, end, contact, note) rows in `zone`."""
+    starts = to_local([row[2] for row in rows], zone)
+    ends = to_local([row[3] for row in rows], zone)
+    return [
+        {
             "id": row[0],
             "name": row[1],
+            "day": start_dt.strftime("%A %d/%m/%Y"),
             "time_display": f"{start_dt.strftime('%I:%M %p')} → {end_dt.strftime('%I:%M %p')}",
             "date_iso": start_dt.strftime("%Y-%m-%d"),
             "start_iso": start_dt.strftime("%H:%M"),
             "end_iso": end_dt.strftime("%H:%M"),
             "contact": row[4],
-            "note": row[5]
-        })
+            "note": row[5],
+            "recurring": row[0] < 0,  # series occurrences have negative ids
+        }
+        for row, start_dt, end_dt in zip(rows, starts, ends)
+    ]
+
+def scrim_event(scrim_id, name, start_utc, end_utc, contact=None, note=None):
+    """Live event payload; times stay in UTC because viewers differ in zone."""
+    return {"id": scrim_id, "name": name, "start_time_utc": start_utc, "end_time_utc": end_utc,
+            "contact": contact, "note": note}
+
+def local_midnight_utc(day, zone):
+    return local_to_utc(day, time.min, zone)
+
+async def get_scrims_grouped(page: int = 0, tz_name: str = DEFAULT_TIMEZONE, team_id: int = DEFAULT_TEAM_ID):
+    """
+    A team's upcoming scrims grouped by day in `tz_name`, SCRIMS_PAGE_DAYS
+    days per page. Each zone's view is built once and cached until the
+    team's scrims version changes, its local date rolls over or the
+    earliest scrim in it ends.
+    """
+    global _scrims_view_cache
+    zone = get_zone(tz_name)
+    now = datetime.now(timezone.utc)
+    today = now.astimezone(zone).date()
+    version = await get_version("scrims", team_id)
+
+    key = (version, team_id, tz_name, page, today)
+    cached = _scrims_view_cache.get(key)
+    if cached and (cached[0] is None or cached[0] > now):
+        return cached[1], cached[2]
+
+    window_start = local_midnight_utc(today + timedelta(days=page * SCRIMS_PAGE_DAYS), zone)
+    window_end = local_midnight_utc(today + timedelta(days=(page + 1) * SCRIMS_PAGE_DAYS), zone)
+    rows = await get_upcoming_scrims(
+        now.isoformat(),
+        until=window_end.isoformat(),
+        starts_from=window_start.isoformat() if page else None,
+        team_id=team_id,
+    )
+    has_more = bool(await get_upcoming_scrims(
+        now.isoformat(), starts_from=window_end.isoformat(), limit=1, team_id=team_id
+    ))
 
-    return grouped
+    grouped = defaultdict(list)
+    for item in scrim_views(rows, zone):
+        grouped[item["day"]].append(item)
+
+    expires = min((datetime.fromisoformat(row[3]) for row in rows), default=None)
+    if expires is not None and expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+
+    _scrims_view_cache = {k: v for k, v in _scrims_view_cache.items() if k[1] != team_id or k[0] == version}
+    while len(_scrims_view_cache) >= SCRIMS_VIEW_CACHE_MAX:
+        del _scrims_view_cache[next(iter(_scrims_view_cache))]
+    _scrims_view_cache[key] = (expires, grouped, has_more)
+    return grouped, has_more
+
+def scrim_local_times(request: Request, data: dict):
+    """
+    (zone name, local date, start, end) for a posted YYYY-MM-DD date and
+    HH:MM times, read in the posted "timezone" (the browser's) or the
+    request's zone.
+    """
+    tz_name = data.get("timezone") or cookie_timezone(request) or DEFAULT_TIMEZONE
+    try:
+        get_zone(tz_name)
+        day = datetime.strptime(data["date"], "%Y-%m-%d").date()
+        start = datetime.strptime(data["start_time"], "%H:%M").time()
+        end = datetime.strptime(data["end_time"], "%H:%M").time()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return tz_name, day, start, end
+
+def scrim_times_utc(request: Request, data: dict):
+    """
+    UTC ISO start/end for a posted local date and times. An end at or
+    before the start is taken to be after midnight.
+    """
+    tz_name, day, start, end = scrim_local_times(request, data)
+    zone = get_zone(tz_name)
+    start_utc = local_to_utc(day, start, zone)
+    end_utc = local_to_utc(day + timedelta(days=1) if end <= start else day, end, zone)
+    return start_utc.isoformat(), end_utc.isoformat()
+
+# Shorthands the add form offers; anything else is sent as a raw RRULE
+REPEAT_RULES = {"daily": "FREQ=DAILY", "weekly": "FREQ=WEEKLY", "fortnightly": "FREQ=WEEKLY;INTERVAL=2"}
+
+async def create_series(request: Request, data: dict, team_id: int) -> int:
+    """Store a recurring scrim from an add-form payload with "repeat" or "rule"."""
+    rule = REPEAT_RULES.get(data.get("repeat")) or data.get("rule")
+    if not rule:
+        raise HTTPException(status_code=400, detail=f"repeat must be one of {', '.join(REPEAT_RULES)}, or give a rule")
+    if data.get("until"):
+        rule += ";UNTIL=" + data["until"].replace("-", "") + "T235959"
+    elif data.get("count"):
+        rule += f";COUNT={int(data['count'])}"
+
+    tz_name, day, start, end = scrim_local_times(request, data)
+    dtstart = datetime.combine(day, start)
+    duration = datetime.combine(day + timedelta(days=1) if end <= start else day, end) - dtstart
+    try:
+        return await add_series(
+            data["name"], dtstart, int(duration.total_seconds() // 60), tz_name, rule,
+            data.get("contact"), data.get("note"), team_id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def overlap_conflict(error: OverlapError) -> HTTPException:
+    """409 listing the scrims a booking overlaps; resend with "allow_overlap" to book anyway."""
+    return HTTPException(status_code=409, detail={
+        "message": str(error),
+        "conflicts": [scrim_event(row[0], row[1], row[2], row[3]) for row in error.conflicts],
+    })
 
 # --- ADD SCRIM ---
-@app.post("/add")
-async def add_scrim(data: dict = Body(...)):
+@router.post("/add")
+async def add_scrim(request: Request, data: dict = Body(...), team_id: int = Depends(current_team)):
+    """Add one scrim, or a recurring series when "repeat" (or "rule") is given."""
     name = data.get("name")
     date = data.get("date")
     start_time = data.get("start_time")
@@ -90,40 +365,46 @@ async def add_scrim(data: dict = Body(...)):
     if not all([name, date, start_time, end_time]):
         raise HTTPException(status_code=400, detail="Missing required fields")
 
-    start_dt_local = datetime.strptime(f"{date} {start_time}", "%Y-%m-%d %H:%M")
-    end_dt_local = datetime.strptime(f"{date} {end_time}", "%Y-%m-%d %H:%M")
-    start_dt_utc = start_dt_local.astimezone(pytz.utc).isoformat()
-    end_dt_utc = end_dt_local.astimezone(pytz.utc).isoformat()
+    if data.get("repeat") or data.get("rule"):
+        series_id = await create_series(request, data, team_id)
+        events.publish("series_changed", {"series_id": series_id, "name": name}, team_id)
+        notify_bot()
+        return {"success": True, "series_id": series_id}
 
-    async with aiosqlite.connect(DB) as db:
-        await db.execute(
-            "INSERT INTO scrims (name, start_time_utc, end_time_utc, contact, note) VALUES (?, ?, ?, ?, ?)",
-            (name, start_dt_utc, end_dt_utc, contact, note)
-        )
-        await db.commit()
+    start_dt_utc, end_dt_utc = scrim_times_utc(request, data)
+
+    try:
+        scrim_id = await add_scrim_db(name, start_dt_utc, end_dt_utc, contact, note, team_id,
+                                      check_overlap=not data.get("allow_overlap"))
+    except OverlapError as e:
+        raise overlap_conflict(e)
+    events.publish("scrim_added", scrim_event(scrim_id, name, start_dt_utc, end_dt_utc, contact, note), team_id)
 
-    await refresh_scrims()  # Immediately update Discord
+    notify_bot()  # Discord is updated by the bot from the change feed
     return {"success": True}
 
+def posted_id(data: dict, field: str) -> int:
+    """The integer id posted as `field`; 400 when it is missing or not a number."""
+    try:
+        return int(data[field])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{field} must be an integer id")
+
 # --- DELETE SCRIM ---
-@app.post("/delete")
-async def delete_scrim(data: dict = Body(...)):
-    scrim_id = data.get("scrim_id")
-    if not scrim_id:
-        raise HTTPException(status_code=400, detail="scrim_id is required")
+@router.post("/delete")
+async def delete_scrim(data: dict = Body(...), team_id: int = Depends(current_team)):
+    scrim_id = posted_id(data, "scrim_id")
 
-    async with aiosqlite.connect(DB) as db:
-        cursor = await db.execute("DELETE FROM scrims WHERE rowid = ?", (scrim_id,))
-        await db.commit()
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Scrim not found")
+    if not await delete_scrim_db(scrim_id, team_id):
+        raise HTTPException(status_code=404, detail="Scrim not found")
+    events.publish("scrim_deleted", {"id": scrim_id}, team_id)
 
-    await refresh_scrims()
+    notify_bot()
     return {"success": True}
 
 # --- EDIT SCRIM ---
-@app.post("/edit")
-async def edit_scrim(data: dict = Body(...)):
+@router.post("/edit")
+async def edit_scrim(request: Request, data: dict = Body(...), team_id: int = Depends(current_team)):
     scrim_id = data.get("scrim_id")
     name = data.get("name")
     date = data.get("date")
@@ -134,128 +415,426 @@ async def edit_scrim(data: dict = Body(...)):
 
     if not all([scrim_id, name, date, start_time, end_time]):
         raise HTTPException(status_code=400, detail="Missing required fields")
+    scrim_id = posted_id(data, "scrim_id")
 
-    start_dt_local = datetime.strptime(f"{date} {start_time}", "%Y-%m-%d %H:%M")
-    end_dt_local = datetime.strptime(f"{date} {end_time}", "%Y-%m-%d %H:%M")
-    start_dt_utc = start_dt_local.astimezone(pytz.utc).isoformat()
-    end_dt_utc = end_dt_local.astimezone(pytz.utc).isoformat()
-
-    async with aiosqlite.connect(DB) as db:
-        cursor = await db.execute(
-            """UPDATE scrims
-               SET name = ?, start_time_utc = ?, end_time_utc = ?, contact = ?, note = ?
-               WHERE rowid = ?""",
-            (name, start_dt_utc, end_dt_utc, contact, note, scrim_id)
-        )
-        await db.commit()
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Scrim not found")
+    start_dt_utc, end_dt_utc = scrim_times_utc(request, data)
 
-    await refresh_scrims()
+    try:
+        updated = await update_scrim_db(scrim_id, name, start_dt_utc, end_dt_utc, contact, note, team_id,
+                                        check_overlap=not data.get("allow_overlap"))
+    except OverlapError as e:
+        raise overlap_conflict(e)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Scrim not found")
+    events.publish("scrim_edited", scrim_event(scrim_id, name, start_dt_utc, end_dt_utc, contact, note), team_id)
+
+    notify_bot()
     return {"success": True}
 
-# --- AVAILABILITY PAGE ---
-@app.get("/availability")
-async def availability_page(request: Request):
-    return templates.TemplateResponse("availability.html", {"request": request})
-
-@app.get("/api/availability")
-async def get_availability(player_id: int) -> Dict:
-    async with aiosqlite.connect(DB) as db:
-        cursor = await db.execute(
-            "SELECT day, time, status FROM availability WHERE player_id = ?", (player_id,)
-        )
-        rows = await cursor.fetchall()
+# --- IMPORT SCRIMS ---
+MAX_IMPORT_SCRIMS = 500
+IMPORT_FIELDS = ["name", "date", "start_time", "end_time", "contact", "note", "timezone"]
+
+@router.post("/api/scrims/import")
+async def import_scrims(request: Request, allow_overlap: bool = Query(False), team_id: int = Depends(current_team)):
+    """
+    Add a batch of one-off scrims (e.g. a tournament's fixtures) in one
+    transaction. The body is JSON, a list of add-form objects or
+    {"scrims": [...], "allow_overlap": true}, or CSV with a header row of
+    IMPORT_FIELDS. Nothing is added unless every row is valid and, without
+    allow_overlap, none overlaps another row or a booked scrim (409).
+    """
+    if request.headers.get("content-type", "").startswith("text/csv"):
+        text = (await request.body()).decode("utf-8-sig")
+        items = list(csv.DictReader(io.StringIO(text)))
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be JSON or text/csv")
+        if isinstance(body, dict):
+            allow_overlap = allow_overlap or bool(body.get("allow_overlap"))
+            body = body.get("scrims")
+        items = body
+    if not isinstance(items, list) or not items or len(items) > MAX_IMPORT_SCRIMS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {MAX_IMPORT_SCRIMS} scrims")
+
+    rows = []
+    for position, item in enumerate(items, start=1):
+        if not isinstance(item, dict) or not all(item.get(field) for field in IMPORT_FIELDS[:4]):
+            raise HTTPException(status_code=400, detail=f"Row {position}: missing required fields")
+        try:
+            start_utc, end_utc = scrim_times_utc(request, item)
+        except HTTPException as e:
+            raise HTTPException(status_code=400, detail=f"Row {position}: {e.detail}")
+        rows.append((item["name"], start_utc, end_utc, item.get("contact") or None, item.get("note") or None))
+
+    try:
+        ids = await add_scrims_db(rows, team_id, check_overlap=not allow_overlap)
+    except OverlapError as e:
+        raise overlap_conflict(e)
+    events.publish("scrims_imported", {
+        "ids": ids, "scrims": [scrim_event(scrim_id, *row) for scrim_id, row in zip(ids, rows)],
+    }, team_id)
+
+    notify_bot()  # one change event, so one board redraw
+    return {"success": True, "added": len(ids), "ids": ids}
+
+# --- SERIES ---
+@router.get("/api/series")
+async def get_series_api(team_id: int = Depends(current_team)):
+    return {"series": await get_series_list(team_id)}
+
+@router.post("/api/series/delete")
+async def delete_series_api(data: dict = Body(...), team_id: int = Depends(current_team)):
+    """Delete a whole series; single dates are deleted through /delete."""
+    series_id = posted_id(data, "series_id")
+    if not await delete_series_db(series_id, team_id):
+        raise HTTPException(status_code=404, detail="Series not found")
+    events.publish("series_changed", {"series_id": series_id}, team_id)
+    notify_bot()
+    return {"success": True}
+
+# --- STATS ---
+@router.get("/stats")
+async def stats_page(request: Request, team_id: int = Depends(current_team)):
+    return templates.TemplateResponse(
+        "stats.html", {"request": request, "stats": await get_scrim_stats(team_id), "base": team_base(request)}
+    )
 
-    result = defaultdict(dict)
-    for day, time, status in rows:
-        result[day][time] = status
-    return dict(result)
+@router.get("/api/stats")
+async def stats_api(
+    weeks: int = Query(12, ge=1, le=520),
+    opponents: int = Query(50, ge=1, le=500),
+    team_id: int = Depends(current_team),
+):
+    """Scrims played, hours and RSVP attendance per opponent and per week, from the summary tables."""
+    return await get_scrim_stats(team_id, weeks, opponents)
+
+# --- CALENDAR FEED ---
+# Calendar apps poll this every few minutes. The feed is a function of the
+# team's scrims version (plus the attendance version for a user's feed)
+# and the UTC date, since series occurrences roll into the window daily,
+# so an unchanged schedule costs one version read and a 304.
+CALENDAR_MAX_AGE_SECONDS = 300
+
+def http_date(moment: datetime) -> str:
+    return email.utils.format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+def not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Whether the client's If-None-Match (or, failing that, If-Modified-Since) still holds."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return email.utils.parsedate_to_datetime(if_modified_since) >= last_modified.replace(microsecond=0)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@router.get("/calendar.ics")
+async def calendar_feed(request: Request, user_id: int = Query(None), team_id: int = Depends(current_team)):
+    """The team's scrims from today on as iCalendar; with user_id, only those the user is attending."""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    version, updated_at = await get_version_stamp("scrims", team_id)
+    tag, changed = f"{team_id}-{version}-{today:%Y%m%d}", [today]
+    if updated_at:
+        changed.append(datetime.fromisoformat(updated_at))
+    if user_id is not None:
+        rsvp_version, rsvp_updated_at = await get_version_stamp("attendance")
+        tag += f"-{user_id}-{rsvp_version}"
+        if rsvp_updated_at:
+            changed.append(datetime.fromisoformat(rsvp_updated_at))
+
+    etag, last_modified = f'"{tag}"', max(changed)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": f"max-age={CALENDAR_MAX_AGE_SECONDS}",
+    }
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    # Scrims that ended earlier today stay in until tomorrow's feed
+    rows = await get_upcoming_scrims(today.isoformat(), team_id=team_id)
+    if user_id is not None:
+        attending = await get_user_scrims(user_id)
+        rows = [row for row in rows if row[0] in attending]
+    name = next((team["name"] for team in await cached_teams() if team["id"] == team_id), "Scrims")
+    headers["Content-Disposition"] = 'inline; filename="scrims.ics"'
+    return StreamingResponse(
+        calendar_chunks(rows, f"{name} scrims", utc_stamp(last_modified.isoformat()), request.url.hostname or "scrimbot"),
+        media_type="text/calendar; charset=utf-8",
+        headers=headers,
+    )
+
+# --- TIMEZONE ---
+@app.get("/api/timezone")
+async def get_timezone_api(request: Request, user_id: int = Query(None)):
+    return {"timezone": await request_timezone(request, user_id=user_id)}
+
+@app.post("/api/timezone")
+async def set_timezone_api(data: dict = Body(...)):
+    """Remember a browser's zone in a cookie, and for a user_id in the users table."""
+    tz_name = data.get("timezone")
+    try:
+        get_zone(tz_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if data.get("user_id") is not None:
+        await set_user_timezone(posted_id(data, "user_id"), tz_name)
+
+    response = JSONResponse({"success": True, "timezone": tz_name})
+    response.set_cookie(TIMEZONE_COOKIE, tz_name, max_age=365 * 24 * 3600, samesite="lax")
+    return response
+
+# --- AVAILABILITY PAGE ---
+@router.get("/availability")
+async def availability_page(request: Request, team_id: int = Depends(current_team)):
+    return templates.TemplateResponse("availability.html", {"request": request, "base": team_base(request)})
+
+@router.get("/api/availability")
+async def get_availability(player_id: int, week_offset: int = Query(None),
+                           team_id: int = Depends(current_team)) -> Dict:
+    """A player's availability, for one week when `week_offset` is given."""
+    if not any(player["id"] == player_id for player in await get_players(team_id)):
+        raise HTTPException(status_code=404, detail="Player not found")
+    if week_offset is None:
+        return await get_player_availability(player_id)
+    monday = week_monday(week_offset)
+    return await get_player_availability(player_id, monday, monday + timedelta(days=6))
 
 
 # --- POST availability ---
-@app.post("/api/availability")
-async def set_availability_api(data: dict = Body(...)):
-    player_id = int(data["player_id"])
-    day_short = data.get("day")   # "Monday", etc.
-    time = data.get("time")
-    status = data.get("status")
-    week_offset = int(data.get("week_offset", 0))  # Pass from frontend
+MAX_BATCH_CHANGES = 500
+
+def availability_change(change: dict, default_week_offset: int = 0):
+    """Turn one posted cell change into (player_id, "Monday 30/12/2025", time, status)."""
+    try:
+        player_id = int(change["player_id"])
+        week_offset = int(change.get("week_offset", default_week_offset))
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(400, "Missing required fields")
+    day_short = change.get("day")   # "Monday", etc.
+    time = change.get("time")
+    status = change.get("status")
 
     if not all([day_short, time, status]):
         raise HTTPException(400, "Missing required fields")
+    if day_short not in DAYS or status not in AVAILABILITY_STATUSES:
+        raise HTTPException(400, "Invalid day or status")
 
     # Compute full date string for the day
-    today = datetime.now(local_tz)
-    monday = today - timedelta(days=today.weekday()) + timedelta(weeks=week_offset)
+    monday = week_monday(week_offset)
     day_index = DAYS.index(day_short)
     full_date = (monday + timedelta(days=day_index)).strftime("%A %d/%m/%Y")
-
-    async with aiosqlite.connect(DB) as db:
-        if status == "none":
-            await db.execute(
-                "DELETE FROM availability WHERE player_id = ? AND day = ? AND time = ?",
-                (player_id, full_date, time)
-            )
-        else:
-            # Upsert: delete old value first
-            await db.execute(
-                "DELETE FROM availability WHERE player_id = ? AND day = ? AND time = ?",
-                (player_id, full_date, time)
-            )
-            await db.execute(
-                "INSERT INTO availability (player_id, day, time, status) VALUES (?, ?, ?, ?)",
-                (player_id, full_date, time, status)
-            )
-        await db.commit()
+    return player_id, full_date, time, status
+
+def publish_availability(changes, team_id: int):
+    events.publish("availability", {"cells": [
+        {"player_id": player_id, "date": day_label_to_iso(day), "time": time, "status": status}
+        for player_id, day, time, status in changes
+    ]}, team_id)
+
+@router.post("/api/availability")
+async def set_availability_api(data: dict = Body(...), team_id: int = Depends(current_team)):
+    player_id, full_date, time, status = availability_change(data)
+    try:
+        await set_availability(player_id, full_date, time, status, team_id)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    publish_availability([(player_id, full_date, time, status)], team_id)
 
     return JSONResponse({"success": True})
 
-@app.get("/api/availability_all")
-async def get_all_availability(date: str = Query(...)):
-    dt = datetime.strptime(date, "%Y-%m-%d")
-    day_key = dt.strftime("%A %d/%m/%Y")
-
-    result = {}
-    players = fetch_players()  # use the internal helper instead of await get_players()
-
-    for player in players:
-        pid = player["id"]
-        availability = await get_availability(pid)  # still async for DB
-        result[pid] = availability
-
-    return result
+# --- POST a batch of availability changes ---
+@router.post("/api/availability/batch")
+async def set_availability_batch_api(data: dict = Body(...), team_id: int = Depends(current_team)):
+    """Apply many cell changes with one upsert transaction."""
+    changes = data.get("changes") or []
+    if not isinstance(changes, list) or len(changes) > MAX_BATCH_CHANGES:
+        raise HTTPException(400, f"changes must be a list of at most {MAX_BATCH_CHANGES} items")
+
+    try:
+        week_offset = int(data.get("week_offset", 0))
+    except (TypeError, ValueError):
+        raise HTTPException(400, "week_offset must be an integer")
+    parsed = [availability_change(change, week_offset) for change in changes]
+    try:
+        applied = await set_availability_many(parsed, team_id)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    publish_availability(parsed, team_id)
+
+    return JSONResponse({"success": True, "applied": applied})
+
+def parse_day_range(start: str, end: str, week_offset: int):
+    """Inclusive list of local dates from start/end (YYYY-MM-DD) or a week offset."""
+    try:
+        if start:
+            first = datetime.strptime(start, "%Y-%m-%d").date()
+            last = datetime.strptime(end, "%Y-%m-%d").date() if end else first
+        else:
+            first = week_monday(week_offset or 0)
+            last = first + timedelta(days=6)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+
+    span = (last - first).days + 1
+    if span < 1 or span > MAX_MATRIX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must cover 1 to {MAX_MATRIX_DAYS} days")
+    return [first + timedelta(days=i) for i in range(span)]
+
+@router.get("/api/availability/matrix")
+async def get_availability_matrix_api(
+    start: str = Query(None),
+    end: str = Query(None),
+    week_offset: int = Query(None),
+    team_id: int = Depends(current_team),
+):
+    """Player x day x slot availability for a date range or a week."""
+    days = parse_day_range(start, end, week_offset)
+    return await get_availability_matrix(days, team_id)
+
+@router.get("/api/availability/windows")
+async def find_windows_api(
+    start: str = Query(None),
+    end: str = Query(None),
+    week_offset: int = Query(None),
+    duration: int = Query(60, ge=15, le=24 * 60),
+    min_players: int = Query(5, ge=1),
+    limit: int = Query(10, ge=1, le=100),
+    team_id: int = Depends(current_team),
+):
+    """Ranked scrim windows where at least `min_players` are available."""
+    days = parse_day_range(start, end, week_offset)
+    data = await get_availability_matrix(days, team_id)
+    return {"windows": find_windows(data, duration, min_players, limit)}
+
+@router.get("/api/availability_all")
+async def get_all_availability(date: str = Query(...), team_id: int = Depends(current_team)):
+    """Legacy shape of the matrix for a single day."""
+    try:
+        return await get_all_availability_db(date, team_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
 
 # --- Updates players named that has been edited
-@app.post("/api/player")
-async def edit_player(data: dict = Body(...)):
+@router.post("/api/player")
+async def edit_player(data: dict = Body(...), team_id: int = Depends(current_team)):
     player_id = data.get("id")
     name = data.get("name")
     if player_id is None or not name:
         raise HTTPException(status_code=400, detail="Invalid request")
-    await update_player_name(int(player_id), name)
+    await update_player_name(int(player_id), name, team_id)
+    events.publish("players", {"players": [{"id": int(player_id), "name": name}]}, team_id)
+    notify_bot()
     return {"success": True}
 
 # --- PLAYERS API GET ---
-@app.get("/api/players")
-async def get_players_endpoint():
-    """API endpoint to return player list from DB"""
-    async with aiosqlite.connect(DB) as db:
-        cursor = await db.execute("SELECT id, name FROM players ORDER BY id ASC")
-        rows = await cursor.fetchall()
-    players = [{"id": row[0], "name": row[1]} for row in rows]
-    return JSONResponse(players)
+@router.get("/api/players")
+async def get_players_endpoint(team_id: int = Depends(current_team)):
+    """The team's roster from the DB"""
+    return JSONResponse(await get_players(team_id))
 
 # --- PLAYERS API POST ---
-@app.post("/api/players")
-async def set_players_api(data: dict = Body(...)):
-    players = data["players"]
-    if len(players) != 6:
-        raise HTTPException(status_code=400, detail="Must provide exactly 6 players")
-    for i, name in enumerate(players, start=1):
-        await update_player_name(i, name)
+MAX_ROSTER_CHANGES = 100
+
+@router.post("/api/players")
+async def set_players_api(data: dict = Body(...), team_id: int = Depends(current_team)):
+    """
+    Change the roster in one request. "players" renames, as
+    [{"id": 1, "name": "..."}] or a list of names in roster order; "add"
+    is a list of new names and "remove" a list of player ids (their
+    availability goes with them).
+    """
+    players = data.get("players") or []
+    added = [str(name).strip() for name in data.get("add") or []]
+    try:
+        removed = [int(player_id) for player_id in data.get("remove") or []]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="remove must be a list of player ids")
+    if len(players) + len(added) + len(removed) > MAX_ROSTER_CHANGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ROSTER_CHANGES} changes at once")
+
+    if players and all(isinstance(p, dict) for p in players):
+        try:
+            renames = [(int(p["id"]), p["name"].strip()) for p in players]
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise HTTPException(status_code=400, detail="Each player needs an id and a name")
+    else:
+        roster = await get_players(team_id)
+        if len(players) > len(roster):
+            raise HTTPException(status_code=400, detail=f"The roster has {len(roster)} players; use add for more")
+        renames = [(p["id"], str(name).strip()) for p, name in zip(roster, players)]
+    if not all(name for _, name in renames) or not all(added):
+        raise HTTPException(status_code=400, detail="Player names cannot be empty")
+
+    if renames:
+        await update_player_names(renames, team_id)
+    if added:
+        ids = await add_players(added, team_id)
+        renames += list(zip(ids, added))
+    if removed:
+        await remove_players(removed, team_id)
+    events.publish("players", {
+        "players": [{"id": pid, "name": name} for pid, name in renames],
+        "roster": bool(added or removed),
+    }, team_id)
+    notify_bot()
     return JSONResponse({"success": True})
 
+# --- LIVE CHANGES (Server-Sent Events) ---
+@router.get("/api/events")
+async def event_stream(request: Request, team_id: int = Depends(current_team)):
+    """Push the team's scrim, availability and player deltas to its open pages."""
+    queue = events.subscribe(team_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            events.unsubscribe(queue, team_id)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+app.include_router(router)
+app.include_router(router, prefix="/teams/{team_id}")
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    health = {
+        "status": "ok",
+        "event_loop_lag_ms": round(metrics.loop_lag["last"] * 1000, 2),
+        "event_loop_lag_max_ms": round(metrics.loop_lag["max"] * 1000, 2),
+    }
+    if bot_module is None:
+        health["bot"] = {"mode": BOT_MODE}
+    else:
+        bot = bot_module.bot
+        latency = bot.latency
+        health["bot"] = {
+            "mode": BOT_MODE,
+            "ready": bot.is_ready(),
+            "closed": bot.is_closed(),
+            "gateway_latency_ms": round(latency * 1000, 2) if math.isfinite(latency) else None,
+            "outbound_backlog": bot_module.outbound.backlog,
+        }
+        if not bot.is_ready():
+            health["status"] = "degraded"
+    return health
\ No newline at end of file